@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+import hashlib
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
@@ -9,7 +10,8 @@ import pyarrow.parquet as pq
 import dask.dataframe as dd
 import geopandas as gpd
 from shapely.geometry import Point
-from flask_app import create_fire_risk_map_overlay
+from flask_app import create_fire_risk_map_overlay, map_inputs, MAP_POINTS_MODE, MAP_GENERATOR_VERSION
+from build_cache import build_if_changed
 
 df = dd.read_parquet('csv_support/fire_data.parquet', columns=['Latitude', 'Longitude', 'Vegetation_Density', 'Fire_Risk'])
 
@@ -122,42 +124,51 @@ grid_df['Predicted_Fire_Risk'] = fire_risk_clf.predict(
     np.c_[grid_df['Latitude'].values, grid_df['Longitude'].values, grid_df['Predicted_Vegetation'].values]
 )
 
-map_romania = create_fire_risk_map_overlay()
-
 # Number of points for visualization
 sampled_grid = grid_df.sample(n=750, random_state=42)
 
 vegetation_colors = {1: 'green', 2: 'yellow', 3: 'saddlebrown', 4: 'gray'}
 fire_risk_colors = {1: 'green', 2: 'yellow', 3: 'orange', 4: 'red', 5: 'saddlebrown'}
 
-for _, row in sampled_grid.iterrows():
-    lat, lon = row['Latitude'], row['Longitude']
-    veg = row['Predicted_Vegetation']
-    risk = row['Predicted_Fire_Risk']
+def build_prediction_map(map_path):
+    map_romania = create_fire_risk_map_overlay()
+
+    for _, row in sampled_grid.iterrows():
+        lat, lon = row['Latitude'], row['Longitude']
+        veg = row['Predicted_Vegetation']
+        risk = row['Predicted_Fire_Risk']
+
+        veg_name = {1: 'High_Vegetation', 2: 'Medium_Vegetation', 3: 'Low_Vegetation', 4: 'Urban'}[int(veg)]
+        risk_name = {1: 'Very Low', 2: 'Low', 3: 'Medium', 4: 'High'}[int(risk)]
 
-    veg_name = {1: 'High_Vegetation', 2: 'Medium_Vegetation', 3: 'Low_Vegetation', 4: 'Urban'}[int(veg)]
-    risk_name = {1: 'Very Low', 2: 'Low', 3: 'Medium', 4: 'High'}[int(risk)]
+        veg_color = vegetation_colors.get(veg, 'gray')
+        fire_color = fire_risk_colors.get(risk, 'gray')
 
-    veg_color = vegetation_colors.get(veg, 'gray')
-    fire_color = fire_risk_colors.get(risk, 'gray')
+        folium.CircleMarker(
+            location=[lat, lon],
+            radius=3,
+            color=fire_color,
+            fill=True,
+            fill_color=fire_color,
+            fill_opacity=0.4,
+            popup=f"Risk: {risk_name} | Vegetation: {veg_name}"
+        ).add_to(map_romania)
 
-    folium.CircleMarker(
-        location=[lat, lon],
-        radius=3,
-        color=fire_color,
-        fill=True,
-        fill_color=fire_color,
-        fill_opacity=0.4,
-        popup=f"Risk: {risk_name} | Vegetation: {veg_name}"
-    ).add_to(map_romania)
+    map_romania.save(map_path)
+
+# Bump when the page layout above changes. The base map comes from flask_app,
+# so its generator version, points mode and inputs are part of the fingerprint too
+PREDICTION_MAP_VERSION = 1
+# The sampled predictions are part of the fingerprint, an identical retrain skips the map
+predictions_hash = hashlib.sha1(pd.util.hash_pandas_object(sampled_grid, index=False).values.tobytes()).hexdigest()
 
 #map_romania.save("Maps/predicted_romania_map.html")
-map_romania.save("Maps/server_romania_map_1.html")
+build_if_changed("Maps/server_romania_map_1.html", map_inputs(MAP_POINTS_MODE),
+                 build_prediction_map, [PREDICTION_MAP_VERSION, MAP_GENERATOR_VERSION],
+                 extra={'points_mode': MAP_POINTS_MODE, 'predictions': predictions_hash})
 print("Map saved to Maps/predicted_romania_map_1.html")
 
-import joblib
-import os
-
-os.makedirs("models", exist_ok=True)
-joblib.dump(vegetation_clf, "models/vegetation_rf.joblib")
-joblib.dump(fire_risk_clf, "models/fire_rf.joblib")
\ No newline at end of file
+# Writes models/vegetation_rf.joblib and models/fire_rf_latest.joblib, then the
+# manifest the server's model watcher reloads from
+from model_registry import publish
+publish(vegetation_clf, fire_risk_clf)
\ No newline at end of file
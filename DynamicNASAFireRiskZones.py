@@ -2,9 +2,10 @@
 #and together wit the NASA API it learns form active temperature
 #and fire history and further trains the model for better accuracy
 
-import os, io, requests, pandas as pd, geopandas as gpd
-from shapely.geometry import Point
+import os, io, pandas as pd, geopandas as gpd
 from SensoInfo import MAP_KEY_NASA_FIRMS
+from async_upstream import upstream
+from boundary import get_boundary
 import numpy as np
 
 MAP_KEY = MAP_KEY_NASA_FIRMS
@@ -13,23 +14,19 @@ SOURCE = "VIIRS_NOAA21_NRT" # fresh 375m data
 DAYS   = 1
 BUFFER_M = 600
 
-world_shape = gpd.read_file("Assets_AI/Country_shape.shp")
+boundary = get_boundary()
+romania_shape = boundary.gdf
+rom_polygon   = boundary.geometry  # prepared
 
-if world_shape.crs is None:
-    world_shape = world_shape.set_crs("EPSG:4326")
-
-if world_shape.crs.to_epsg() != 4326:
-    world_shape = world_shape.to_crs(4326)
-
-romania_shape = world_shape[world_shape['SOVEREIGNT'] == 'Romania']
-rom_polygon   = romania_shape.geometry.unary_union
+# Fetched once per /api/fires window, one request at a time is plenty
+upstream.limit_host("https://firms.modaps.eosdis.nasa.gov", 1)
 
 def fetch_firms_csv(map_key: str) -> pd.DataFrame:
     url = (
         "https://firms.modaps.eosdis.nasa.gov/api/area/csv/"
         f"{map_key}/{SOURCE}/{BBOX[0]},{BBOX[1]},{BBOX[2]},{BBOX[3]}/{DAYS}"
     )
-    csv = requests.get(url, timeout=30)
+    csv = upstream.get(url, timeout=30)
     csv.raise_for_status()
     fires_df = pd.read_csv(io.StringIO(csv.text))
     if fires_df.empty:
@@ -41,36 +38,42 @@ def get_fires_gdf(map_key: str) -> gpd.GeoDataFrame:
     fires_df = fetch_firms_csv(map_key)
     if fires_df.empty:
         return gpd.GeoDataFrame(fires_df, geometry=[], crs="EPSG:4326")
+    inside = boundary.intersects_xy(fires_df.longitude.to_numpy(), fires_df.latitude.to_numpy())
+    fires_df = fires_df[inside]
     fires_gdf = gpd.GeoDataFrame(
         fires_df,
-        geometry=[Point(xy) for xy in zip(fires_df.longitude, fires_df.latitude)],
+        geometry=gpd.points_from_xy(fires_df.longitude, fires_df.latitude),
         crs="EPSG:4326"
     )
-    fires_gdf = fires_gdf[fires_gdf.intersects(rom_polygon)]
     return fires_gdf
 
 #====MODEL LOADING====
-import joblib
-vegetation_clf = joblib.load("models/vegetation_rf.joblib")
-fire_model = joblib.load("models/fire_rf_latest.joblib")
+# Loaded and hot-reloaded by the registry, see model_registry.py
+from model_registry import registry
+from prediction_cache import PredictionCache
 
 HIGH = 4
 #grid_gdf=grid_gdf.to_crs(3857)
 #high_gdf = grid_gdf[grid_gdf["Predicted_Fire_Risk"] >= HIGH]
 
 
-def predict_grid(grid_gdf_4326: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+def predict_grid(grid_gdf_4326: gpd.GeoDataFrame, models=None) -> gpd.GeoDataFrame:
     assert {'Latitude','Longitude'}.issubset(grid_gdf_4326.columns), "grid_gdf must have Latitude, Longitude"
-    veg_pred = vegetation_clf.predict(grid_gdf_4326[["Latitude","Longitude"]])
-    X = np.c_[grid_gdf_4326["Latitude"].values,
-              grid_gdf_4326["Longitude"].values,
-              veg_pred]
-    risk_class = fire_model.predict(X)
+    models = models or registry.current()
+    veg_pred, risk_class = models.predict(grid_gdf_4326["Latitude"].values,
+                                          grid_gdf_4326["Longitude"].values)
     out = grid_gdf_4326.copy()
     out["Predicted_Vegetation"] = veg_pred.astype(int)
     out["Predicted_Fire_Risk"] = risk_class.astype(int)
     return out
 
+predictions = PredictionCache()
+
+def cached_predictions(grid, models=None) -> gpd.GeoDataFrame:
+    # grid: prediction_grid.PredictionGrid; the result is shared, do not modify it
+    models = models or registry.current()
+    return predictions.get(grid, models.version, lambda gdf: predict_grid(gdf, models))
+
 #=====Accuracy based on how many generated points intersect the actual real fire zone=====
 
 def evaluate_vs_firms(preds_4326: gpd.GeoDataFrame, fires_4326: gpd.GeoDataFrame):
@@ -0,0 +1,88 @@
+#Buffered access log writer
+#Request threads only enqueue a timestamp; a background thread appends them
+#in batches (every FLUSH_LINES events or FLUSH_SECONDS) and rotates the CSV
+#once it passes MAX_BYTES, keeping BACKUP_COUNT old files.
+
+import os
+import queue
+import atexit
+import logging
+import threading
+import time
+
+FLUSH_LINES = 500
+FLUSH_SECONDS = 2.0
+MAX_BYTES = 5 * 2**20
+BACKUP_COUNT = 5
+
+_STOP = object()
+
+
+class AccessLogWriter:
+    def __init__(self, path, flush_lines=FLUSH_LINES, flush_seconds=FLUSH_SECONDS,
+                 max_bytes=MAX_BYTES, backup_count=BACKUP_COUNT):
+        self.path = path
+        self.flush_lines = flush_lines
+        self.flush_seconds = flush_seconds
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def log(self, timestamp):
+        if self._thread is None:
+            self._start()
+        self._queue.put(timestamp)
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._run, name='access-log-writer', daemon=True)
+                thread.start()
+                atexit.register(self.close)
+                self._thread = thread
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_seconds
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._flush(batch)
+                return
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.flush_lines or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_seconds
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            with open(self.path, 'a') as f:
+                f.write(''.join(f"{timestamp}\n" for timestamp in batch))
+            if os.path.getsize(self.path) >= self.max_bytes:
+                self._rotate()
+        except OSError:
+            logging.exception(f"Could not write {len(batch)} access log lines to {self.path}")
+
+    def _rotate(self):
+        # access_logs.csv -> .1 -> .2 ... the oldest backup is dropped
+        oldest = f'{self.path}.{self.backup_count}'
+        if os.path.exists(oldest):
+            os.remove(oldest)
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{i}'):
+                os.replace(f'{self.path}.{i}', f'{self.path}.{i + 1}')
+        os.replace(self.path, f'{self.path}.1')
@@ -0,0 +1,137 @@
+#Asyncio upstream client shared by the proxy routes
+#One event loop thread owns a pooled aiohttp session. Calls from waitress
+#worker threads are admitted per host (at most UPSTREAM_HOST_LIMIT at a time
+#unless the host was given its own limit) and overall (UPSTREAM_TOTAL_LIMIT,
+#waiting up to ADMISSION_WAIT seconds for both slots), then cut off at a strict
+#timeout. Slow upstreams can hold at most UPSTREAM_TOTAL_LIMIT worker threads:
+#10 of waitress's 16 leaves room for the 4 SSE streams (MAX_STREAMS) and 2 for
+#/api/points and friends.
+
+import os
+import json
+import time
+import asyncio
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+import aiohttp
+from multidict import CIMultiDict
+
+UPSTREAM_HOST_LIMIT = int(os.getenv('UPSTREAM_HOST_LIMIT', 4))
+UPSTREAM_TIMEOUT = float(os.getenv('UPSTREAM_TIMEOUT', 10))
+UPSTREAM_TOTAL_LIMIT = int(os.getenv('UPSTREAM_TOTAL_LIMIT', 10))
+ADMISSION_WAIT = float(os.getenv('UPSTREAM_ADMISSION_WAIT', 1.0))
+
+
+class UpstreamBusy(Exception):
+    pass
+
+
+class UpstreamTimeout(Exception):
+    pass
+
+
+class UpstreamError(Exception):
+    pass
+
+
+class UpstreamResponse:
+    def __init__(self, status_code, headers, content):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise UpstreamError(f"Upstream answered {self.status_code}")
+
+
+class UpstreamClient:
+    def __init__(self, host_limit=UPSTREAM_HOST_LIMIT, admission_wait=ADMISSION_WAIT,
+                 total_limit=UPSTREAM_TOTAL_LIMIT):
+        self.host_limit = host_limit
+        self.host_limits = {}
+        self.total_limit = total_limit
+        self._total = threading.BoundedSemaphore(total_limit)
+        self.admission_wait = admission_wait
+        self._loop = None
+        self._session = None
+        self._hosts = {}
+        self._active = Counter()
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name='upstream-loop', daemon=True).start()
+
+            async def open_session():
+                # The admission slots bound each host, the connector does not
+                connector = aiohttp.TCPConnector(limit=0, ttl_dns_cache=300)
+                return aiohttp.ClientSession(connector=connector)
+            self._session = asyncio.run_coroutine_threadsafe(open_session(), loop).result()
+            self._loop = loop
+
+    def limit_host(self, url_or_host, limit: int):
+        # Own limit for one host, set before its first request
+        host = urlsplit(url_or_host).netloc or url_or_host
+        with self._lock:
+            if host in self._hosts:
+                raise RuntimeError(f"{host} already has requests admitted")
+            self.host_limits[host] = limit
+
+    def _slot(self, host) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.host_limits.get(host, self.host_limit))
+            return self._hosts[host]
+
+    async def _request(self, url, params, timeout):
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+        async with self._session.get(url, params=params, timeout=client_timeout) as response:
+            content = await response.read()
+            return UpstreamResponse(response.status, CIMultiDict(response.headers), content)
+
+    def get(self, url, params=None, timeout=UPSTREAM_TIMEOUT) -> UpstreamResponse:
+        if self._loop is None:
+            self._start()
+        host = urlsplit(url).netloc
+        slot = self._slot(host)
+        deadline = time.monotonic() + self.admission_wait
+        if not slot.acquire(timeout=self.admission_wait):
+            raise UpstreamBusy(f"Too many requests in flight to {host}")
+        if not self._total.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            slot.release()
+            raise UpstreamBusy("Too many upstream requests in flight")
+        with self._lock:
+            self._active[host] += 1
+        try:
+            future = asyncio.run_coroutine_threadsafe(self._request(url, params, timeout), self._loop)
+            try:
+                return future.result(timeout + 1)
+            except (asyncio.TimeoutError, TimeoutError):
+                future.cancel()
+                raise UpstreamTimeout(f"{host} did not answer within {timeout}s")
+            except aiohttp.ClientError as e:
+                raise UpstreamError(f"{host}: {e}")
+        finally:
+            with self._lock:
+                self._active[host] -= 1
+            self._total.release()
+            slot.release()
+
+    def in_flight(self) -> dict:
+        with self._lock:
+            return {host: n for host, n in self._active.items() if n}
+
+
+upstream = UpstreamClient()
@@ -0,0 +1,80 @@
+#Bytes read and latency of a bbox load: legacy first-million read vs
+#row-group pruning on the Hilbert-repacked file
+#usage: python benchmarks/bench_bbox_pruning.py original.parquet repacked.parquet [west,south,east,north]
+
+import os
+import sys
+import time
+import pandas as pd
+import pyarrow.parquet as pq
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from parquet_store import read_bbox
+
+COLUMNS = ['Latitude', 'Longitude', 'Vegetation_Density']
+
+
+# Loader /api/points used before the shared store and the grid index
+def load_filtered_parquet_first_million(path, bbox):
+    table = pq.read_table(path, columns=COLUMNS)
+    limited_table = table.slice(0, 1_000_000)
+    df = limited_table.to_pandas()
+
+    west, south, east, north = bbox
+    df['Latitude'] = pd.to_numeric(df['Latitude'], errors='coerce')
+    df['Longitude'] = pd.to_numeric(df['Longitude'], errors='coerce')
+    df.dropna(subset=['Latitude', 'Longitude'], inplace=True)
+
+    df = df[
+        (df['Latitude'] >= south) & (df['Latitude'] <= north) &
+        (df['Longitude'] >= west) & (df['Longitude'] <= east)
+    ]
+    return df
+
+
+def _overlaps(stats, low, high):
+    return stats is None or not stats.has_min_max or (stats.max >= low and stats.min <= high)
+
+
+def column_bytes(path, bbox=None):
+    # Compressed column-chunk bytes the reader has to fetch
+    metadata = pq.ParquetFile(path).metadata
+    names = [metadata.schema.column(i).name for i in range(metadata.num_columns)]
+    wanted = [names.index(c) for c in COLUMNS]
+    west, south, east, north = bbox or (None,) * 4
+    total = groups = 0
+    for g in range(metadata.num_row_groups):
+        rg = metadata.row_group(g)
+        if bbox is not None:
+            lat = rg.column(names.index('Latitude')).statistics
+            lon = rg.column(names.index('Longitude')).statistics
+            if not (_overlaps(lat, south, north) and _overlaps(lon, west, east)):
+                continue
+        groups += 1
+        total += sum(rg.column(i).total_compressed_size for i in wanted)
+    return total, groups, metadata.num_row_groups
+
+
+def timed(fn, *args, repeat=3, **kwargs):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+
+if __name__ == '__main__':
+    original, repacked = sys.argv[1], sys.argv[2]
+    bbox = tuple(map(float, sys.argv[3].split(','))) if len(sys.argv) > 3 else (25.4, 45.5, 25.8, 45.8)
+
+    legacy, t_legacy = timed(load_filtered_parquet_first_million, original, bbox)
+    pruned, t_pruned = timed(read_bbox, bbox, columns=COLUMNS, path=repacked)
+    b_legacy, g_legacy, n_legacy = column_bytes(original)
+    b_pruned, g_pruned, n_pruned = column_bytes(repacked, bbox)
+
+    print(f"bbox={bbox}")
+    print(f"legacy first-million: {t_legacy * 1000:9.1f} ms  {b_legacy / 2**20:8.1f} MiB  "
+          f"{g_legacy}/{n_legacy} row groups  {len(legacy)} rows")
+    print(f"pruned pushdown:      {t_pruned * 1000:9.1f} ms  {b_pruned / 2**20:8.1f} MiB  "
+          f"{g_pruned}/{n_pruned} row groups  {len(pruned)} rows")
@@ -0,0 +1,61 @@
+#Row-wise vs vectorized H3 aggregation on synthetic Romania points
+#usage: python benchmarks/bench_h3_aggregation.py [n_points] [resolution]
+
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import h3
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from h3_aggregation import aggregate_h3
+
+
+# Implementation /api/points used before the vectorized path
+def aggregate_h3_rowwise(df, resolution=7):
+    df['h3_index'] = df.apply(lambda row: h3.geo_to_h3(row['Latitude'], row['Longitude'], resolution), axis=1)
+    grouped = df.groupby('h3_index').agg({
+        'Latitude': 'mean',
+        'Longitude': 'mean',
+        'Vegetation_Density': lambda x: x.mode()[0],
+        'h3_index': 'count'
+    }).rename(columns={'h3_index': 'count'}).reset_index()
+    return grouped
+
+
+def synthetic_points(n, seed=42):
+    rng = np.random.default_rng(seed)
+    classes = np.array(['High_Vegetation', 'Medium_Vegetation', 'Low_Vegetation', 'Urban'], dtype=object)
+    return pd.DataFrame({
+        'Latitude': rng.uniform(43.6, 48.3, n),
+        'Longitude': rng.uniform(20.2, 29.7, n),
+        'Vegetation_Density': classes[rng.integers(0, len(classes), n)],
+    })
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    resolution = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    df = synthetic_points(n)
+
+    old, t_old = timed(aggregate_h3_rowwise, df.copy(), resolution)
+    new, t_new = timed(aggregate_h3, df, resolution)
+
+    old = old.sort_values('h3_index').reset_index(drop=True)
+    new = new.sort_values('h3_index').reset_index(drop=True)
+    assert old['h3_index'].tolist() == new['h3_index'].tolist()
+    assert (old['count'].to_numpy() == new['count'].to_numpy()).all()
+    assert (old['Vegetation_Density'].to_numpy() == new['Vegetation_Density'].to_numpy()).all()
+    assert np.allclose(old[['Latitude', 'Longitude']].to_numpy(), new[['Latitude', 'Longitude']].to_numpy())
+
+    print(f"points={n} resolution={resolution} cells={len(new)}")
+    print(f"row-wise:   {t_old:8.3f} s")
+    print(f"vectorized: {t_new:8.3f} s")
+    print(f"speedup:    {t_old / t_new:8.1f}x")
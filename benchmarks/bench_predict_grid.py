@@ -0,0 +1,66 @@
+#Cells/second of grid inference: the original monolithic predict_grid vs
+#the chunked thread-pool engine, on the Romania grid at a given step
+#usage: python benchmarks/bench_predict_grid.py [step] [threads,...]
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import joblib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from prediction_grid import build_grid
+from model_registry import VEGETATION_MODEL, FIRE_MODEL
+from inference import predict_chain, single_threaded, CHUNK_SIZE
+from build_cache import file_digest
+from flat_forest import load_if_current
+
+
+# predict_grid before the chunked engine: two single calls on float64 slices
+def predict_grid_monolithic(vegetation_clf, fire_model, grid_gdf_4326):
+    veg_pred = vegetation_clf.predict(grid_gdf_4326[["Latitude","Longitude"]])
+    X = np.c_[grid_gdf_4326["Latitude"].values,
+              grid_gdf_4326["Longitude"].values,
+              veg_pred]
+    risk_class = fire_model.predict(X)
+    return veg_pred, risk_class
+
+
+def timed(fn, *args, repeat=3, **kwargs):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+
+if __name__ == '__main__':
+    step = float(sys.argv[1]) if len(sys.argv) > 1 else 0.05
+    threads = [int(t) for t in sys.argv[2].split(',')] if len(sys.argv) > 2 else [1, 2, 4, os.cpu_count() or 1]
+
+    grid = build_grid(step)
+    lat = grid['Latitude'].to_numpy()
+    lon = grid['Longitude'].to_numpy()
+    print(f"step={step:g}: {len(grid)} cells, chunk size {CHUNK_SIZE}")
+
+    # Saved with n_jobs=-1, so the legacy path keeps sklearn's own threading
+    (veg_ref, risk_ref), t = timed(predict_grid_monolithic, joblib.load(VEGETATION_MODEL),
+                                   joblib.load(FIRE_MODEL), grid)
+    print(f"monolithic predict_grid:    {len(grid) / t:12,.0f} cells/s  ({t:.2f}s)")
+
+    engines = [('sklearn', single_threaded(joblib.load(VEGETATION_MODEL)), single_threaded(joblib.load(FIRE_MODEL)))]
+    flat = [load_if_current(path, file_digest(path)) for path in (VEGETATION_MODEL, FIRE_MODEL)]
+    if all(f is not None for f in flat):
+        engines.append(('flat', *flat))
+    else:
+        print("no current flat export, run flat_forest.py to include it")
+
+    for name, vegetation, fire in engines:
+        for n in sorted(set(threads)):
+            with ThreadPoolExecutor(n) as executor:
+                (veg, risk), t = timed(predict_chain, vegetation, fire, lat, lon, executor=executor)
+            same = np.array_equal(veg, veg_ref) and np.array_equal(risk, risk_ref)
+            print(f"chunked {name:7s} {n:2d} threads: {len(grid) / t:12,.0f} cells/s  ({t:.2f}s)  "
+                  f"{'identical' if same else 'DIFFERENT'}")
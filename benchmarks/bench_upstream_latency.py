@@ -0,0 +1,85 @@
+#Latency of cheap requests while a proxied upstream is slow: blocking
+#requests.get per worker vs the shared async upstream client
+#Runs against two local stand-in servers, no network needed.
+#usage: python benchmarks/bench_upstream_latency.py [workers] [slow_requests] [slow_seconds]
+
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from async_upstream import UpstreamClient, UpstreamBusy, UpstreamTimeout
+
+
+def stand_in_server(delay):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            body = b'{"ok": true}'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_address[1]}/'
+
+
+def run(get, workers, slow_url, fast_url, slow_requests, fast_requests=50):
+    # Same shape as waitress: a fixed pool of worker threads, slow proxy
+    # calls queued first, then the cheap requests everyone else makes
+    fast_latency = []
+    outcomes = {'ok': 0, 'busy': 0, 'timeout': 0}
+    lock = threading.Lock()
+
+    def slow():
+        try:
+            get(slow_url)
+            key = 'ok'
+        except UpstreamBusy:
+            key = 'busy'
+        except (UpstreamTimeout, requests.Timeout):
+            key = 'timeout'
+        with lock:
+            outcomes[key] += 1
+
+    def fast(submitted):
+        get(fast_url)
+        fast_latency.append(time.perf_counter() - submitted)
+
+    with ThreadPoolExecutor(workers) as pool:
+        for _ in range(slow_requests):
+            pool.submit(slow)
+        for _ in range(fast_requests):
+            pool.submit(fast, time.perf_counter())
+            time.sleep(0.02)
+    latency = np.array(fast_latency) * 1000
+    return np.percentile(latency, 50), np.percentile(latency, 99), outcomes
+
+
+if __name__ == '__main__':
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    slow_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    slow_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 3.0
+    slow_url = stand_in_server(slow_seconds)
+    fast_url = stand_in_server(0)
+
+    blocking = run(lambda url: requests.get(url, timeout=10), workers, slow_url, fast_url, slow_requests)
+    # Cap each upstream at a quarter of the pool, reject quickly beyond it
+    client = UpstreamClient(host_limit=max(1, workers // 4), admission_wait=0.1)
+    pooled = run(lambda url: client.get(url, timeout=10), workers, slow_url, fast_url, slow_requests)
+
+    print(f"{workers} workers, {slow_requests} upstream calls taking {slow_seconds}s")
+    for name, (p50, p99, outcomes) in (('blocking requests.get', blocking), ('async upstream', pooled)):
+        print(f"{name:22s} fast p50 {p50:8.1f} ms  p99 {p99:8.1f} ms  slow calls {outcomes}")
@@ -0,0 +1,68 @@
+#Romania boundary service
+#The Natural Earth shapefile is read once. The country geometry is kept
+#prepared for point predicates, and GeoJSON variants simplified at a few
+#tolerances are built up front for /romania-geojson?tolerance=.
+
+import os
+import logging
+import threading
+import numpy as np
+import shapely
+import geopandas as gpd
+from utlis import resource_path
+from build_cache import stat_version
+
+SHAPEFILE = resource_path('Assets_AI/Country_shape.shp')
+COUNTRY = 'Romania'
+# Degrees, 0 is the full-resolution outline
+TOLERANCES = (0.0, 0.001, 0.005, 0.01, 0.05)
+
+
+def shapefile_files(path: str = SHAPEFILE) -> list:
+    base = os.path.splitext(path)[0]
+    return [base + ext for ext in ('.shp', '.shx', '.dbf', '.prj')]
+
+
+class Boundary:
+    def __init__(self, path: str = SHAPEFILE, country: str = COUNTRY, tolerances=TOLERANCES):
+        self.version = stat_version([path])
+        world = gpd.read_file(path)
+        if world.crs is None:
+            world = world.set_crs('EPSG:4326')
+        elif world.crs.to_epsg() != 4326:
+            world = world.to_crs(4326)
+
+        self.gdf = world[world['SOVEREIGNT'] == country]
+        self.geometry = self.gdf.geometry.union_all()
+        shapely.prepare(self.geometry)
+        self.tolerances = tuple(sorted(tolerances))
+        self._geojson = {}
+        for tolerance in self.tolerances:
+            variant = self.gdf
+            if tolerance > 0:
+                variant = self.gdf.assign(geometry=self.gdf.geometry.simplify(tolerance, preserve_topology=True))
+            self._geojson[tolerance] = variant.__geo_interface__
+
+    def snap_tolerance(self, tolerance: float) -> float:
+        # Coarsest precomputed variant that is still at least as detailed as asked
+        return max(t for t in self.tolerances if t <= max(tolerance, 0.0))
+
+    def geojson(self, tolerance: float = 0.0) -> dict:
+        return self._geojson[self.snap_tolerance(tolerance)]
+
+    def intersects_xy(self, lon, lat) -> np.ndarray:
+        return shapely.intersects_xy(self.geometry, lon, lat)
+
+
+_boundary = None
+_boundary_lock = threading.Lock()
+
+def get_boundary() -> Boundary:
+    global _boundary
+    if _boundary is None:
+        with _boundary_lock:
+            if _boundary is None:
+                boundary = Boundary()
+                logging.info(f"{COUNTRY} boundary loaded, {len(boundary.tolerances)} simplified variants")
+                _boundary = boundary
+    return _boundary
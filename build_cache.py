@@ -0,0 +1,104 @@
+#Content-hash build cache for generated files (map HTML)
+#A manifest next to each output records the hash of every input plus the
+#generator version. Inputs whose size/mtime did not move reuse the recorded
+#hash, so an unchanged restart costs a few stat() calls.
+
+import os
+import json
+import hashlib
+import logging
+import threading
+
+MANIFEST_SUFFIX = '.build.json'
+
+
+def file_digest(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stat_version(paths) -> str:
+    # Cheap version for files too large to hash per request: path, size, mtime
+    digest = hashlib.sha1()
+    for path in paths:
+        st = os.stat(path)
+        digest.update(f'{path}:{st.st_size}:{st.st_mtime_ns};'.encode())
+    return digest.hexdigest()[:16]
+
+
+def _input_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def _input_state(path: str, previous: dict) -> dict:
+    if not os.path.exists(path):
+        return {'missing': True}
+    st = os.stat(path)
+    if previous and previous.get('size') == st.st_size and previous.get('mtime_ns') == st.st_mtime_ns:
+        return previous
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha1': file_digest(path)}
+
+
+def _read_manifest(output: str) -> dict:
+    try:
+        with open(output + MANIFEST_SUFFIX, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_atomic(path: str, write):
+    # write(tmp_path) produces the file, readers never see a partial one
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def invalidate(output: str):
+    # For writers that bypass build_if_changed
+    if os.path.exists(output + MANIFEST_SUFFIX):
+        os.remove(output + MANIFEST_SUFFIX)
+
+
+def build_if_changed(output: str, inputs, build, version, extra=None) -> bool:
+    # -> True when build(tmp_path) ran, False when the output was current
+    previous = _read_manifest(output)
+    old_inputs = previous.get('inputs', {})
+    states = {path: _input_state(path, old_inputs.get(path)) for path in _input_files(inputs)}
+
+    key = json.dumps({
+        'version': version,
+        'extra': extra,
+        'inputs': {path: state.get('sha1') for path, state in states.items()},
+    }, sort_keys=True)
+    fingerprint = hashlib.sha1(key.encode()).hexdigest()
+
+    if os.path.exists(output) and previous.get('fingerprint') == fingerprint:
+        if states != old_inputs:
+            # Touched but identical inputs, refresh the recorded mtimes
+            write_atomic(output + MANIFEST_SUFFIX, lambda tmp: _dump(tmp, fingerprint, states))
+        logging.info(f"{output} is up to date, skipping generation")
+        return False
+
+    logging.info(f"Generating {output}")
+    write_atomic(output, build)
+    write_atomic(output + MANIFEST_SUFFIX, lambda tmp: _dump(tmp, fingerprint, states))
+    return True
+
+
+def _dump(path, fingerprint, states):
+    with open(path, 'w') as f:
+        json.dump({'fingerprint': fingerprint, 'inputs': states}, f, indent=1)
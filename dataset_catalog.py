@@ -0,0 +1,103 @@
+#Statistics catalog for Final_sheet.parquet
+#Computed once per dataset version and stored as a sidecar JSON next to the
+#parquet file: row count, class histograms, bounding box, per-region counts.
+#Build it as an ingestion step with:  python dataset_catalog.py
+#Charts and health checks read this instead of the raw rows.
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+import numpy as np
+import shapely
+from shapely.geometry import shape
+from utlis import resource_path
+from build_cache import write_atomic
+from parquet_store import PARQUET_FILE, get_dataset
+from spatial_index import get_spatial_index
+
+CATALOG_FILE = os.path.splitext(PARQUET_FILE)[0] + '.stats.json'
+REGIONS_FILE = resource_path('reg_graphs/regions.geojson')
+CATALOG_VERSION = 1
+
+
+def region_counts(dataset, index, regions_path: str = REGIONS_FILE) -> dict:
+    with open(regions_path, 'r') as f:
+        regions = json.load(f)
+
+    lat = dataset.column('Latitude')
+    lon = dataset.column('Longitude')
+    counts = {}
+    for feature in regions['features']:
+        geometry = shape(feature['geometry'])
+        # Grid index narrows to the region bbox, contains_xy does the rest in bulk
+        rows = index.query(geometry.bounds)
+        inside = shapely.contains_xy(geometry, lon[rows].astype(np.float64), lat[rows].astype(np.float64))
+        region_id = feature['properties']['id']
+        counts[str(region_id)] = {
+            'name': feature['properties'].get('name', region_id),
+            'rows': int(inside.sum()),
+        }
+    return counts
+
+
+def build_catalog(dataset) -> dict:
+    lat = dataset.column('Latitude')
+    lon = dataset.column('Longitude')
+    empty = len(dataset) == 0
+    return {
+        'catalog_version': CATALOG_VERSION,
+        # The loaded dataset, which may be older than the file on disk
+        'source': {'path': os.path.basename(dataset.path), 'sha1': dataset.version},
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'rows': len(dataset),
+        'bbox': None if empty else {
+            'west': float(lon.min()), 'south': float(lat.min()),
+            'east': float(lon.max()), 'north': float(lat.max()),
+        },
+        'histograms': {
+            'Vegetation_Density': dataset.value_counts('Vegetation_Density'),
+            'Fire_Risk': dataset.value_counts('Fire_Risk'),
+        },
+        'regions': region_counts(dataset, get_spatial_index()),
+    }
+
+
+def _read_catalog(path: str) -> dict:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_catalog(path: str, catalog: dict):
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump(catalog, f, indent=1)
+    write_atomic(path, write)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog() -> dict:
+    # Sidecar when it describes the dataset in memory, rebuilt (and rewritten) otherwise
+    global _catalog
+    with _catalog_lock:
+        dataset = get_dataset()
+        previous = _catalog or _read_catalog(CATALOG_FILE)
+        current = (previous.get('catalog_version') == CATALOG_VERSION
+                   and previous.get('source', {}).get('sha1') == dataset.version)
+        if not current:
+            logging.info(f"Building dataset statistics catalog {CATALOG_FILE}")
+            previous = build_catalog(dataset)
+            _write_catalog(CATALOG_FILE, previous)
+        _catalog = previous
+        return _catalog
+
+
+if __name__ == '__main__':
+    catalog = get_catalog()
+    print(f"{catalog['rows']} rows, {len(catalog['regions'])} regions -> {CATALOG_FILE}")
@@ -1,8 +1,6 @@
 from flask import Flask, render_template, send_from_directory, request, jsonify
-from flask import send_file
+from flask import send_file, Response, stream_with_context
 from folium.plugins import MarkerCluster
-import pyarrow.parquet as pq
-from collections import Counter
 import pandas as pd
 import numpy as np
 import geopandas as gpd
@@ -14,73 +12,70 @@ from folium import raster_layers,Element
 from datetime import datetime,timedelta
 import random
 import threading
+import itertools
+import time
 import json
 import typing_extensions
 import os
-import h3
 from waitress import serve
 from utlis import resource_path
 import logger
 import logging
 from DataBaseLogIn import DB_FILE,get_db_connection,init_db
+from parquet_store import PARQUET_FILE,get_dataset,read_bbox
+from build_cache import build_if_changed,write_atomic,invalidate
+from spatial_index import get_spatial_index
+from h3_aggregation import aggregate_h3
+from h3_pyramid import get_pyramid, resolution_for
+from map_tiles import valid_tile, cached_tile, vector_tile, heatmap_tile, HEATMAP_COLORS
+from warmup import Warmup
+from async_upstream import upstream, UpstreamBusy, UpstreamTimeout, UpstreamError
+from risk_series import RiskSeries
+from access_log import AccessLogWriter
+from metrics import HourlyCounter
+from dataset_catalog import get_catalog
+from response_cache import ResponseCache
+from boundary import SHAPEFILE, shapefile_files, get_boundary
+from prediction_grid import get_grid
+from model_registry import registry
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 app = Flask(__name__)
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
-init_db()
+# Heavy assets load in the background, see create_app()
+warmup = Warmup()
 
 access_log_file = resource_path('csv_support/access_logs.csv')
+access_log = AccessLogWriter(access_log_file)
+access_counter = HourlyCounter()
 
 # Natural Earth Countries shapefile
-shapefile_path = resource_path('Assets_AI/Country_shape.shp')
+shapefile_path = SHAPEFILE
 
 #logging.basicConfig(filename='app.log', level=logging.INFO)
 
-world = gpd.read_file(shapefile_path)
-world = world.set_crs('EPSG:4326', allow_override=True)
+def get_romania():
+    return get_boundary().gdf
 
-romania = world[world['SOVEREIGNT'] == 'Romania']
-
-risk_counter = Counter()
-CHUNK_SIZE=1000000
 MAX_POINTS_PER_CHUNK=500
-PARQUET_FILE = resource_path('csv_support/Final_sheet.parquet')
 
 def load_parquet_data():
-    df = pd.read_parquet(PARQUET_FILE)
-    df['Latitude'] = pd.to_numeric(df['Latitude'], errors='coerce')
-    df['Longitude'] = pd.to_numeric(df['Longitude'], errors='coerce')
-    df.dropna(subset=['Latitude', 'Longitude', 'Vegetation_Density'], inplace=True)
-    return df
+    return get_dataset().frame()
 
 # Coordinates to H3 and aggregate
 def get_h3_aggregated(df, resolution=7):
-    df['h3_index'] = df.apply(lambda row: h3.geo_to_h3(row['Latitude'], row['Longitude'], resolution), axis=1)
-    grouped = df.groupby('h3_index').agg({
-        'Latitude': 'mean',
-        'Longitude': 'mean',
-        'Vegetation_Density': lambda x: x.mode()[0],
-        'h3_index': 'count'
-    }).rename(columns={'h3_index': 'count'}).reset_index()
-    return grouped
-
-def load_filtered_parquet_first_million(bbox):
-    # First 1,000,000 rows
-    table = pq.read_table(PARQUET_FILE, columns=['Latitude', 'Longitude', 'Vegetation_Density'])
-    limited_table = table.slice(0, 1_000_000)
-    df = limited_table.to_pandas()
-
-    west, south, east, north = bbox
-    df['Latitude'] = pd.to_numeric(df['Latitude'], errors='coerce')
-    df['Longitude'] = pd.to_numeric(df['Longitude'], errors='coerce')
-    df.dropna(subset=['Latitude', 'Longitude'], inplace=True)
-
-    df = df[
-        (df['Latitude'] >= south) & (df['Latitude'] <= north) &
-        (df['Longitude'] >= west) & (df['Longitude'] <= east)
-    ]
-    return df
+    return aggregate_h3(df, resolution)
+
+def load_filtered_points(bbox):
+    columns = ['Latitude', 'Longitude', 'Vegetation_Density']
+    if not warmup.is_ready('spatial_index'):
+        # Shared store not loaded yet, read only the overlapping row groups
+        return read_bbox(bbox, columns=columns).dropna()
+
+    # Row ids from the grid index, over the whole dataset
+    rows = get_spatial_index().query(bbox)
+    return get_dataset().frame(columns, rows=rows)
 
 
 @app.route('/api/points')
@@ -93,19 +88,105 @@ def api_points():
         west, south, east, north = map(float, bbox_param.split(','))
         bbox = (west, south, east, north)
 
-        df = load_filtered_parquet_first_million(bbox)
-        if df.empty:
-            return jsonify([])
+        zoom = request.args.get('zoom', type=float)
+        resolution = resolution_for(bbox, zoom)
+
+        pyramid = get_pyramid() if warmup.is_ready('h3_pyramid') else None
+        if pyramid is not None:
+            grouped = pyramid.query(bbox, resolution)
+        else:
+            # No prebuilt pyramid, aggregate the raw points
+            df = load_filtered_points(bbox)
+            if df.empty:
+                return jsonify([])
+            grouped = get_h3_aggregated(df, resolution)
 
-        grouped = get_h3_aggregated(df)
         points = grouped.to_dict(orient='records')
         return jsonify(points)
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/tiles/<int:z>/<int:x>/<int:y>.pbf')
+@warmup.requires('spatial_index')
+def api_vector_tile(z, x, y):
+    if not valid_tile(z, x, y):
+        return jsonify({'error': 'Invalid tile'}), 400
+    data = cached_tile('vegetation', z, x, y, 'pbf', vector_tile)
+    return (data, 200, {
+        'Content-Type': 'application/vnd.mapbox-vector-tile',
+        'Cache-Control': 'public, max-age=86400'
+    })
+
+@app.route('/api/heatmap/<int:z>/<int:x>/<int:y>.png')
+@warmup.requires('spatial_index')
+def api_heatmap_tile(z, x, y):
+    by = request.args.get('by', 'vegetation')
+    if not valid_tile(z, x, y) or by not in HEATMAP_COLORS:
+        return jsonify({'error': 'Invalid tile'}), 400
+    data = cached_tile(f'heatmap-{by}', z, x, y, 'png', lambda z, x, y: heatmap_tile(z, x, y, by))
+    return (data, 200, {
+        'Content-Type': 'image/png',
+        'Cache-Control': 'public, max-age=86400'
+    })
+
+# 'api' pages only carry the outline and regions, points load on demand;
+# 'inline' embeds every parquet row as a CircleMarker
+MAP_POINTS_MODE = os.getenv('MAP_POINTS_MODE', 'api')
+POINTS_MIN_ZOOM = 10
+
+def add_points_loader(m, show_risk=False):
+    # Heatmap tiles when zoomed out, aggregated /api/points cells when zoomed in
+    map_id = m.get_name()
+    loader_script = Element(f"""
+    <script>
+        document.addEventListener("DOMContentLoaded", function() {{
+            var pointsMap = {map_id};
+            var heatLayer = L.tileLayer('/api/heatmap/{{z}}/{{x}}/{{y}}.png', {{opacity: 0.7, maxZoom: 18}});
+            var pointsLayer = L.layerGroup().addTo(pointsMap);
+            var colors = {{'Low_Vegetation': 'yellow', 'Medium_Vegetation': 'orange', 'High_Vegetation': 'red'}};
+            var risks = {{'yellow': 'Low', 'orange': 'Medium'}};
+            var showRisk = {'true' if show_risk else 'false'};
+            var request = 0;
+
+            function refreshPoints() {{
+                var zoom = pointsMap.getZoom();
+                if (zoom < {POINTS_MIN_ZOOM}) {{
+                    pointsLayer.clearLayers();
+                    if (!pointsMap.hasLayer(heatLayer)) heatLayer.addTo(pointsMap);
+                    return;
+                }}
+                if (pointsMap.hasLayer(heatLayer)) pointsMap.removeLayer(heatLayer);
+
+                var b = pointsMap.getBounds();
+                var bbox = [b.getWest(), b.getSouth(), b.getEast(), b.getNorth()].join(',');
+                var current = ++request;
+                fetch('/api/points?bbox=' + bbox + '&zoom=' + zoom)
+                    .then(function(r) {{ return r.json(); }})
+                    .then(function(cells) {{
+                        if (current !== request || !Array.isArray(cells)) return;
+                        pointsLayer.clearLayers();
+                        cells.forEach(function(c) {{
+                            var color = colors[c.Vegetation_Density] || 'gray';
+                            var popup = 'Vegetation: ' + c.Vegetation_Density;
+                            if (showRisk) popup += ' | Fire risk: ' + (risks[color] || 'High');
+                            L.circleMarker([c.Latitude, c.Longitude], {{
+                                radius: 4, color: color, fill: true, fillColor: color, fillOpacity: 0.5
+                            }}).bindPopup(popup + ' | Points: ' + c.count).addTo(pointsLayer);
+                        }});
+                    }});
+            }}
+
+            pointsMap.on('moveend', refreshPoints);
+            refreshPoints();
+        }});
+    </script>
+    """)
+    m.get_root().html.add_child(loader_script)
+
 #FireRiskMap-Creation for other elements
-def create_fire_risk_map_overlay():
+def create_fire_risk_map_overlay(points_mode=None):
+    points_mode = points_mode or MAP_POINTS_MODE
     m = folium.Map(
         location=[45.9432, 24.9668],
         zoom_start=7,
@@ -131,39 +212,37 @@ def create_fire_risk_map_overlay():
     """)
     m.get_root().html.add_child(alias_script)
 
-    folium.GeoJson(romania).add_to(m)
-    marker_cluster = MarkerCluster().add_to(m)
-
-    df = pd.read_parquet(resource_path('csv_support/Final_sheet.parquet'))
-
-    df['Latitude'] = pd.to_numeric(df['Latitude'], errors='coerce')
-    df['Longitude'] = pd.to_numeric(df['Longitude'], errors='coerce')
-    df.dropna(subset=['Latitude', 'Longitude', 'Vegetation_Density'], inplace=True)
-
-    risk_counter.update(df['Vegetation_Density'].value_counts().to_dict())
-
-    for _, row in df.iterrows():
-        veg = row['Vegetation_Density']
-        color = {
-            'Low_Vegetation': 'yellow',
-            'Medium_Vegetation': 'orange',
-            'High_Vegetation': 'red'
-        }.get(veg, 'gray')
-        if color=="yellow":
-            r="Low"
-        elif color=="orange":
-            r="Medium"
-        else:
-            r="High"
-        folium.CircleMarker(
-            location=[row['Latitude'], row['Longitude']],
-            radius=4,
-            color=color,
-            fill=True,
-            fill_color=color,
-            fill_opacity=0.5,
-            popup=f"Vegetation: {veg} | Fire risk: {r}"
-        ).add_to(marker_cluster)
+    folium.GeoJson(get_romania()).add_to(m)
+    if points_mode == 'inline':
+        marker_cluster = MarkerCluster().add_to(m)
+
+        dataset = get_dataset()
+        df = dataset.frame(['Latitude', 'Longitude', 'Vegetation_Density'])
+
+        for _, row in df.iterrows():
+            veg = row['Vegetation_Density']
+            color = {
+                'Low_Vegetation': 'yellow',
+                'Medium_Vegetation': 'orange',
+                'High_Vegetation': 'red'
+            }.get(veg, 'gray')
+            if color=="yellow":
+                r="Low"
+            elif color=="orange":
+                r="Medium"
+            else:
+                r="High"
+            folium.CircleMarker(
+                location=[row['Latitude'], row['Longitude']],
+                radius=4,
+                color=color,
+                fill=True,
+                fill_color=color,
+                fill_opacity=0.5,
+                popup=f"Vegetation: {veg} | Fire risk: {r}"
+            ).add_to(marker_cluster)
+    else:
+        add_points_loader(m, show_risk=True)
 
     with open(resource_path('reg_graphs/regions.geojson'), 'r') as f:
         regions_data = json.load(f)
@@ -243,12 +322,32 @@ def create_fire_risk_map_overlay():
     """)
     m.get_root().html.add_child(alias_script)
     map_path = resource_path(os.path.join('Maps', 'server_romania_map.html'))
-    m.save(map_path)
+    # Not the page create_fire_risk_map() fingerprinted any more
+    invalidate(map_path)
+    write_atomic(map_path, m.save)
 
     return m
 
+# Bump when the page layout below changes
+MAP_GENERATOR_VERSION = 2
+
+def map_inputs(points_mode):
+    inputs = shapefile_files(shapefile_path)
+    inputs += [resource_path('reg_graphs/regions.geojson'), resource_path('Maps/overlays')]
+    if points_mode == 'inline':
+        inputs.append(PARQUET_FILE)
+    return inputs
+
 # Static map for initial load (without 20M points)
-def create_fire_risk_map():
+def create_fire_risk_map(points_mode=None):
+    points_mode = points_mode or MAP_POINTS_MODE
+    map_path = resource_path(os.path.join('Maps', 'server_romania_map.html'))
+    build_if_changed(map_path, map_inputs(points_mode),
+                     lambda tmp_path: build_fire_risk_map(points_mode).save(tmp_path),
+                     MAP_GENERATOR_VERSION, extra=points_mode)
+    return map_path
+
+def build_fire_risk_map(points_mode):
     m = folium.Map(
         location=[45.9432, 24.9668],
         zoom_start=7,
@@ -257,34 +356,32 @@ def create_fire_risk_map():
         max_bounds=True
     )
 
-    folium.GeoJson(romania).add_to(m)
-    marker_cluster = MarkerCluster().add_to(m)
-
-    df = pd.read_parquet(resource_path('csv_support/Final_sheet.parquet'))
-
-    df['Latitude'] = pd.to_numeric(df['Latitude'], errors='coerce')
-    df['Longitude'] = pd.to_numeric(df['Longitude'], errors='coerce')
-    df.dropna(subset=['Latitude', 'Longitude', 'Vegetation_Density'], inplace=True)
-
-    risk_counter.update(df['Vegetation_Density'].value_counts().to_dict())
-
-    for _, row in df.iterrows():
-        veg = row['Vegetation_Density']
-        color = {
-            'Low_Vegetation': 'yellow',
-            'Medium_Vegetation': 'orange',
-            'High_Vegetation': 'red'
-        }.get(veg, 'gray')
-
-        folium.CircleMarker(
-            location=[row['Latitude'], row['Longitude']],
-            radius=4,
-            color=color,
-            fill=True,
-            fill_color=color,
-            fill_opacity=0.5,
-            popup=f"Vegetation: {veg}"
-        ).add_to(marker_cluster)
+    folium.GeoJson(get_romania()).add_to(m)
+    if points_mode == 'inline':
+        marker_cluster = MarkerCluster().add_to(m)
+
+        dataset = get_dataset()
+        df = dataset.frame(['Latitude', 'Longitude', 'Vegetation_Density'])
+
+        for _, row in df.iterrows():
+            veg = row['Vegetation_Density']
+            color = {
+                'Low_Vegetation': 'yellow',
+                'Medium_Vegetation': 'orange',
+                'High_Vegetation': 'red'
+            }.get(veg, 'gray')
+
+            folium.CircleMarker(
+                location=[row['Latitude'], row['Longitude']],
+                radius=4,
+                color=color,
+                fill=True,
+                fill_color=color,
+                fill_opacity=0.5,
+                popup=f"Vegetation: {veg}"
+            ).add_to(marker_cluster)
+    else:
+        add_points_loader(m)
 
     with open(resource_path('reg_graphs/regions.geojson'), 'r') as f:
         regions_data = json.load(f)
@@ -343,16 +440,14 @@ def create_fire_risk_map():
 
         folium.Popup(popup_html, max_width=400).add_to(geojson_layer)
 
-    map_path = resource_path(os.path.join('Maps', 'server_romania_map.html'))
-    m.save(map_path)
-
-    return map_path
+    return m
 
 #===LOG LOGIC===
 def log_access():
+    # Enqueue only, written in batches by the access-log thread
     timestamp = datetime.now()
-    with open(access_log_file, 'a') as f:
-        f.write(f"{timestamp}\n")
+    access_counter.add(timestamp)
+    access_log.log(timestamp)
 
 @app.before_request
 def track_access():
@@ -361,20 +456,17 @@ def track_access():
 
 #===DIAGNOSTICS LOGIC===
 def create_diagnostic_charts():
-    df = pd.read_parquet(PARQUET_FILE, columns=['Vegetation_Density'])
-    risk_counter.update(df['Vegetation_Density'].value_counts().to_dict())
-    labels = list(risk_counter.keys())
-    values = list(risk_counter.values())
+    distribution = get_catalog()['histograms']['Vegetation_Density']
+    labels = list(distribution.keys())
+    values = list(distribution.values())
     fig1 = px.pie(names=labels, values=values, title="Fire Risk Distribution by Vegetation Density")
     fig1_html = fig1.to_html(full_html=False)
 
     fig2_html=""
-    if os.path.exists(access_log_file):
-        df_log = pd.read_csv(access_log_file, header=None, names=['timestamp'])
-        df_log['timestamp'] = pd.to_datetime(df_log['timestamp'])
-        df_last_24h = df_log[df_log['timestamp'] > (datetime.now() - pd.Timedelta(days=1))].copy()
-        df_last_24h['hour'] = df_last_24h['timestamp'].dt.hour
-        access_count_per_hour = df_last_24h.groupby('hour').size().reset_index(name='access_count')
+    per_hour = access_counter.last_hours()
+    if per_hour:
+        access_count_per_hour = pd.DataFrame({'hour': list(per_hour.keys()),
+                                              'access_count': list(per_hour.values())})
         fig2 = px.bar(access_count_per_hour, x='hour', y='access_count',
                       title="Server Accesses in the Last 24 Hours",
                       labels={'hour': 'Hour of Day', 'access_count': 'Number of Accesses'})
@@ -405,10 +497,11 @@ def create_diagnostic_charts():
 
     return fig1_html + fig2_html + fig3_html
 
-map_path = create_fire_risk_map()
+map_path = resource_path(os.path.join('Maps', 'server_romania_map.html'))
 
 #===DEFAULT ROUTE-TESTING===
 @app.route('/')
+@warmup.requires('map')
 def index():
     logging.info("Main map accessed")
     return send_file(map_path)
@@ -424,52 +517,101 @@ def graph_map():
     logging.info("Ai map accesed in app")
     return send_file(resource_path("Maps/predicted_romania_map.html"))
 
+geojson_responses = ResponseCache()
+
 @app.route("/romania-geojson")
+@warmup.requires('shapefile')
 def romania_geojson():
-    gdf = gpd.read_file(resource_path("Country_shape.shp"))  # Adjust the path to your shapefile
-    romania = gdf[gdf['SOVEREIGNT'] == 'Romania']
-    return jsonify(romania.__geo_interface__)
+    tolerance = request.args.get('tolerance', 0.0, type=float)  # degrees
+    if not tolerance >= 0:  # negative or nan
+        return jsonify({'error': 'tolerance must be a number >= 0'}), 400
+    boundary = get_boundary()
+    tolerance = boundary.snap_tolerance(tolerance)
+    return geojson_responses.json_response('romania-geojson', boundary.version,
+                                           lambda: boundary.geojson(tolerance), args=(tolerance,))
+
+@app.route('/api/dataset-stats')
+@warmup.requires('catalog')
+def dataset_stats():
+    return jsonify(get_catalog())
 
 @app.route('/diagnostics')
+@warmup.requires('catalog')
 def diagnostics():
     logging.info("Diagnostics accessed")
     chart_html = create_diagnostic_charts()
     return render_template('diagnostics.html', chart=chart_html)
 
 
-p = pd.read_parquet(resource_path('csv_support/Final_sheet.parquet'))
+risk_series = None
 
-# Convert categorical fire risk to numeric
-risk_map = {
-    "Very Low": 0.2,
-    "Low": 0.4,
-    "Medium": 0.6,
-    "High": 0.8,
-    "Very High": 1.0
-}
-p['risk_level'] = p['Fire_Risk'].map(risk_map).fillna(0.0)
+def load_risk_stream():
+    global risk_series
+    dataset = get_dataset()
+    series = RiskSeries.from_dataset(dataset)
+    # python risk_series.py measures it against the old DataFrame
+    logging.info(f"Risk stream: {len(series)} rows, {series.nbytes / 2**20:.1f} MiB compact")
+    risk_series = series
 
-p['timestamp'] = pd.date_range(start=datetime.now(), periods=len(p), freq='s')
+MAX_STREAM_BATCH = 1000
+# Each open stream holds a waitress thread: cap them and end each one after
+# STREAM_SECONDS, the browser reconnects from Last-Event-ID
+MAX_STREAMS = 4
+STREAM_SECONDS = 30
+stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
 
-# Global counter - streaming simulation
-current_index = {'value': 0}
-lock = threading.Lock()
+def stream_args(default_limit):
+    cursor = request.args.get('cursor', type=int)
+    limit = request.args.get('limit', default_limit, type=int)
+    return cursor, min(max(limit, 1), MAX_STREAM_BATCH)
+
+# Shared position for clients without a cursor; next() on a count is atomic
+legacy_position = itertools.count()
 
 @app.route('/api/fire-risk-data')
+@warmup.requires('risk_stream')
 def stream_data():
-    with lock:
-        i = current_index['value']
-        if i >= len(p):
-            current_index['value'] = 0  # reset to loop, or just return []
-            i = 0
-
-        row = p.iloc[i]
-        current_index['value'] += 1
+    if len(risk_series) == 0:
+        return jsonify([])
+    cursor, limit = stream_args(100)
+    if cursor is None:
+        # Old polling contract: one row per request from the shared position
+        return jsonify(risk_series.rows(next(legacy_position) % len(risk_series), 1))
+
+    cursor %= len(risk_series)
+    return jsonify({
+        'rows': risk_series.rows(cursor, limit),
+        'next_cursor': (cursor + limit) % len(risk_series)
+    })
 
-    return jsonify([{
-        'timestamp': row['timestamp'].isoformat(),
-        'risk_level': row['risk_level']
-    }])
+@app.route('/api/fire-risk-stream')
+@warmup.requires('risk_stream')
+def stream_risk_events():
+    # Server-Sent Events, every connection keeps its own cursor
+    if len(risk_series) == 0:
+        return jsonify([])
+    cursor, limit = stream_args(1)
+    if cursor is None:
+        cursor = request.headers.get('Last-Event-ID', 0, type=int)
+    interval = max(request.args.get('interval', 1.0, type=float), 0.1)
+    if not stream_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many open streams'}), 503, {'Retry-After': '5'}
+
+    def events(cursor):
+        deadline = time.monotonic() + STREAM_SECONDS
+        yield "retry: 1000\n\n"
+        while True:
+            rows = risk_series.rows(cursor, limit)
+            cursor = (cursor + limit) % len(risk_series)
+            yield f"id: {cursor}\ndata: {json.dumps(rows)}\n\n"
+            if time.monotonic() + interval > deadline:
+                return
+            time.sleep(interval)
+
+    response = Response(stream_with_context(events(cursor % len(risk_series))), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(stream_slots.release)
+    return response
 
 allowed_extensions = {'png', 'jpg', 'jpeg'}
 
@@ -489,6 +631,21 @@ def not_found(error):
     logging.error(f"An page impossibility load occurred: {error}")
     return render_template(resource_path('templates/404.html')), 404
 
+@app.errorhandler(UpstreamBusy)
+def upstream_busy(error):
+    logging.warning(f"Upstream busy: {error}")
+    return jsonify({'error': str(error)}), 503, {'Retry-After': '2'}
+
+@app.errorhandler(UpstreamTimeout)
+def upstream_timeout(error):
+    logging.warning(f"Upstream timeout: {error}")
+    return jsonify({'error': str(error)}), 504
+
+@app.errorhandler(UpstreamError)
+def upstream_error(error):
+    logging.warning(f"Upstream error: {error}")
+    return jsonify({'error': str(error)}), 502
+
 @app.errorhandler(500)
 def internal_error(error):
     logging.error(f"An internal error occurred: {error}")
@@ -499,6 +656,7 @@ import sqlite3
 
 #===DATA BASE===
 @app.route('/users', methods=['GET'])
+@warmup.requires('database')
 def get_users():
     conn = get_db_connection()
     users = conn.execute('SELECT * FROM users').fetchall()
@@ -506,6 +664,7 @@ def get_users():
     return jsonify([dict(user) for user in users])
 
 @app.route('/signup', methods=['POST'])
+@warmup.requires('database')
 def signup():
     data = request.get_json()
     name = data.get('name')
@@ -526,6 +685,7 @@ def signup():
         conn.close()
 
 @app.route('/login', methods=['POST'])
+@warmup.requires('database')
 def login():
     data = request.get_json()
     email = data.get('email')
@@ -543,6 +703,7 @@ def login():
         return jsonify({"error": "Invalid credentials"}), 401
 
 @app.route("/api/user/<email>", methods=["GET"])
+@warmup.requires('database')
 def get_user_data(email):
     conn = get_db_connection()
     user = conn.execute("SELECT name, password FROM users WHERE email = ?", (email,)).fetchone()
@@ -552,6 +713,7 @@ def get_user_data(email):
     return jsonify({}), 404
 
 @app.route("/api/update_password", methods=["POST"])
+@warmup.requires('database')
 def update_password():
     data = request.get_json()
     email = data.get("email")
@@ -564,6 +726,7 @@ def update_password():
     return jsonify({"status": "success"})
 
 @app.route("/api/delete_account", methods=["DELETE"])
+@warmup.requires('database')
 def delete_account():
     data = request.get_json()
     email = data.get("email")
@@ -574,77 +737,87 @@ def delete_account():
     conn.close()
     return jsonify({"status": "deleted"})
 
-import requests
-
 from SensoInfo import OPENWEATHER_API_KEY
+from weather_proxy import WeatherTileCache, WeatherDataCache, valid_layer
 api_key = OPENWEATHER_API_KEY
+weather_tiles = WeatherTileCache(api_key)
+weather_data = WeatherDataCache(api_key)
 
 #===OPENWEATHER INJECTION===
-@app.route('/api/weather-tiles/<layer>/<z>/<x>/<y>.png')
+@app.route('/api/weather-tiles/<layer>/<int:z>/<int:x>/<int:y>.png')
 def proxy_weather_tile(layer, z, x, y):
-    tile_url = f"https://tile.openweathermap.org/map/{layer}/{z}/{x}/{y}.png?appid={api_key}"
-    response = requests.get(tile_url)
-    return (response.content, response.status_code, {
-        'Content-Type': response.headers['Content-Type'],
-        'Cache-Control': 'no-cache'
-    })
+    if not valid_layer(layer):
+        return jsonify({'error': 'Invalid layer'}), 400
+    entry, response = weather_tiles.get(layer, z, x, y)
+    if entry is None:
+        return (response.content, response.status_code, {
+            'Content-Type': response.headers.get('Content-Type', 'text/plain'),
+            'Cache-Control': 'no-cache'
+        })
+
+    headers = {
+        'Content-Type': entry.content_type,
+        'Cache-Control': f'public, max-age={entry.max_age()}',
+        'ETag': entry.etag
+    }
+    if entry.not_modified(request.headers.get('If-None-Match')):
+        return ('', 304, headers)
+    return (entry.content, 200, headers)
 
 @app.route('/api/weather')
 def proxy_weather_data():
-    lat = request.args.get('lat')
-    lon = request.args.get('lon')
-
-    url = f"https://api.openweathermap.org/data/2.5/weather?lat={lat}&lon={lon}&appid={api_key}&units=metric"
-    response = requests.get(url)
-    return jsonify(response.json()), response.status_code
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    if lat is None or lon is None:
+        return jsonify({'error': 'lat and lon are required'}), 400
+    # Also rules out nan and inf, which fail every comparison or range check
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'error': 'lat must be within [-90, 90] and lon within [-180, 180]'}), 400
+
+    payload, status = weather_data.get(lat, lon)
+    return jsonify(payload), status
+
+@app.route('/api/weather/cache-stats')
+def weather_cache_stats():
+    return jsonify(weather_data.stats())
+
+@app.route('/api/upstream-stats')
+def upstream_stats():
+    return jsonify({'in_flight': upstream.in_flight(), 'host_limit': upstream.host_limit,
+                    'host_limits': upstream.host_limits, 'total_limit': upstream.total_limit})
 
 #===MANIPULATE AI MAP===
-from DynamicNASAFireRiskZones import get_fires_gdf,predict_grid,evaluate_vs_firms,gdf_to_featurecollection,downsample_by_risk
+# Models come from model_registry, loaded by the 'models' warm-up and hot-reloaded
 from SensoInfo import MAP_KEY_NASA_FIRMS as MAP_KEY
-from shapely.geometry import Point
-
-def craate_gdf_locally():
-    world = gpd.read_file("Assets_AI/Country_shape.shp")
-    if world.crs is None:
-        world = world.set_crs("EPSG:4326")
-    elif world.crs.to_epsg() != 4326:
-        world = world.to_crs(4326)
-
-    rom = world[world["SOVEREIGNT"] == "Romania"]
-    rom_union = rom.geometry.union_all()
-    min_lat, max_lat = 43.6, 48.3
-    min_lon, max_lon = 20.2, 29.7
-    step = 0.05
-
-    lats = np.arange(min_lat, max_lat, step)
-    lons = np.arange(min_lon, max_lon, step)
-    coords = [(la, lo) for la in lats for lo in lons]
-
-    grid_df = pd.DataFrame(coords, columns=["Latitude", "Longitude"])
-    grid_gdf = gpd.GeoDataFrame(
-        grid_df,
-        geometry=[Point(lo, la) for la, lo in coords],
-        crs="EPSG:4326"
-    )
-    grid_gdf = grid_gdf[grid_gdf.geometry.intersects(rom_union)]
-    return grid_gdf
+FIRES_WINDOW = 600
 
 @app.get("/api/fires")
+@warmup.requires('shapefile')  # DynamicNASAFireRiskZones clips fires to the boundary
 def api_fires():
-    fires = get_fires_gdf(MAP_KEY)  # EPSG:4326
-    return jsonify(gdf_to_featurecollection(fires))
+    from DynamicNASAFireRiskZones import get_fires_gdf,gdf_to_featurecollection
+    # FIRMS is refetched once per window, the same span the AI map polls at
+    window = int(time.time() // FIRES_WINDOW)
+    return geojson_responses.json_response(
+        'fires', window, lambda: gdf_to_featurecollection(get_fires_gdf(MAP_KEY)))  # EPSG:4326
 
 @app.get("/api/predictions")
+@warmup.requires('models', 'prediction_grid')
 def api_predictions():
-    grid_gdf = craate_gdf_locally()
-    preds = predict_grid(grid_gdf)
-    cols = ["Predicted_Fire_Risk","Predicted_Vegetation"]
-    slim = gpd.GeoDataFrame(preds[cols], geometry=preds.geometry, crs=preds.crs)
-
+    from DynamicNASAFireRiskZones import cached_predictions,gdf_to_featurecollection,downsample_by_risk
     ratio = float(request.args.get("ratio", 0.4))  # default: 40%
-    sampled = downsample_by_risk(slim, ratio=ratio, weights={1: 1, 2: 2, 3: 3, 4: 4})
-    return jsonify(gdf_to_featurecollection(sampled))
-    #return jsonify(gdf_to_featurecollection(slim))
+    grid = get_grid()
+    models = registry.current()  # this request stays on one model version
+
+    def build():
+        preds = cached_predictions(grid, models)
+        cols = ["Predicted_Fire_Risk","Predicted_Vegetation"]
+        slim = gpd.GeoDataFrame(preds[cols], geometry=preds.geometry, crs=preds.crs)
+        # Seeded sampling, so the body only depends on the models and the ratio
+        sampled = downsample_by_risk(slim, ratio=ratio, weights={1: 1, 2: 2, 3: 3, 4: 4})
+        return gdf_to_featurecollection(sampled)
+        #return gdf_to_featurecollection(slim)
+    version = (models.version, grid.version)
+    return geojson_responses.json_response('predictions', version, build, args=(ratio,))
 
 from shapely.geometry import Polygon
 from math import sqrt
@@ -654,65 +827,87 @@ def _hexagon(cx: float, cy: float, R: float) -> Polygon:
     xs = cx + R * np.cos(angles)
     ys = cy + R * np.sin(angles)
     return Polygon(np.column_stack([xs, ys]))
-@app.get("/api/prediction_polygons")
-def api_prediction_polygons():
-    try:
-        step_deg   = float(request.args.get("step_deg", 0.05))
-        simplify_m = float(request.args.get("simplify_m", 300))
-        margin     = float(request.args.get("margin", 0.95))
+def build_prediction_polygons(grid, models, step_deg, simplify_m, margin):
+    from DynamicNASAFireRiskZones import cached_predictions,gdf_to_featurecollection
+    preds    = cached_predictions(grid, models)
 
-        grid_gdf = craate_gdf_locally()
-        preds    = predict_grid(grid_gdf)
+    if preds.empty:
+        return {"type":"FeatureCollection","features":[]}
 
-        if preds.empty:
-            return jsonify({"type":"FeatureCollection","features":[]})
+    lat = preds["Latitude"].to_numpy()
+    m_per_deg_lat = 111_132.0
+    m_per_deg_lon = (40_075_016.6856 * np.cos(np.deg2rad(lat))) / 360.0
 
-        lat = preds["Latitude"].to_numpy()
-        m_per_deg_lat = 111_132.0
-        m_per_deg_lon = (40_075_016.6856 * np.cos(np.deg2rad(lat))) / 360.0
+    step_m_lat = step_deg * m_per_deg_lat
+    step_m_lon = step_deg * m_per_deg_lon
 
-        step_m_lat = step_deg * m_per_deg_lat
-        step_m_lon = step_deg * m_per_deg_lon
+    R_fit_vert = step_m_lat / sqrt(3.0)
+    R_fit_horz = step_m_lon / 2.0
+    R = np.minimum(R_fit_vert, R_fit_horz) * margin
 
-        R_fit_vert = step_m_lat / sqrt(3.0)
-        R_fit_horz = step_m_lon / 2.0
-        R = np.minimum(R_fit_vert, R_fit_horz) * margin
+    centers_m = preds.to_crs(3857)
+    xs = centers_m.geometry.x.to_numpy()
+    ys = centers_m.geometry.y.to_numpy()
+    risk = preds["Predicted_Fire_Risk"].to_numpy()
 
-        centers_m = preds.to_crs(3857)
-        xs = centers_m.geometry.x.to_numpy()
-        ys = centers_m.geometry.y.to_numpy()
-        risk = preds["Predicted_Fire_Risk"].to_numpy()
+    hex_polys = [_hexagon(x, y, r) for x, y, r in zip(xs, ys, R)]
+    cells_m = gpd.GeoDataFrame({"Predicted_Fire_Risk": risk}, geometry=hex_polys, crs=3857)
+    dissolved = cells_m.dissolve(by="Predicted_Fire_Risk", as_index=False)
 
-        hex_polys = [_hexagon(x, y, r) for x, y, r in zip(xs, ys, R)]
-        cells_m = gpd.GeoDataFrame({"Predicted_Fire_Risk": risk}, geometry=hex_polys, crs=3857)
-        dissolved = cells_m.dissolve(by="Predicted_Fire_Risk", as_index=False)
+    if simplify_m > 0:
+        dissolved["geometry"] = dissolved.geometry.simplify(simplify_m, preserve_topology=True)
 
-        if simplify_m > 0:
-            dissolved["geometry"] = dissolved.geometry.simplify(simplify_m, preserve_topology=True)
+    out4326 = dissolved.to_crs(4326)[["Predicted_Fire_Risk","geometry"]]
+    return gdf_to_featurecollection(out4326)
 
-        out4326 = dissolved.to_crs(4326)[["Predicted_Fire_Risk","geometry"]]
-        return jsonify(gdf_to_featurecollection(out4326))
+@app.get("/api/prediction_polygons")
+@warmup.requires('models', 'prediction_grid')
+def api_prediction_polygons():
+    try:
+        step_deg   = float(request.args.get("step_deg", 0.05))
+        simplify_m = float(request.args.get("simplify_m", 300))
+        margin     = float(request.args.get("margin", 0.95))
+        grid = get_grid()
+        models = registry.current()
+
+        return geojson_responses.json_response(
+            'prediction_polygons', (models.version, grid.version),
+            lambda: build_prediction_polygons(grid, models, step_deg, simplify_m, margin),
+            args=(step_deg, simplify_m, margin))
 
     except Exception as e:
         traceback.print_exc()
         return jsonify({"error": str(e)}), 500
 @app.get("/api/metrics")
+@warmup.requires('models', 'prediction_grid')
 def api_metrics():
-    grid_gdf = craate_gdf_locally()
+    from DynamicNASAFireRiskZones import get_fires_gdf,cached_predictions,evaluate_vs_firms
     fires = get_fires_gdf(MAP_KEY)
-    preds = predict_grid(grid_gdf)
+    preds = cached_predictions(get_grid())
     m = evaluate_vs_firms(preds, fires)
     return jsonify(m)
 
+@app.get("/api/predictions/cache-stats")
+@warmup.requires('models')
+def prediction_cache_stats():
+    from DynamicNASAFireRiskZones import predictions
+    return jsonify({'model_version': registry.current().version, **predictions.stats()})
+
+@app.get("/api/model")
+@warmup.requires('models')
+def api_model():
+    return jsonify(registry.status())
+
 @app.get("/firmsimportedmap")
 def load():
     return send_file(resource_path("templates/AI_GENERATED_MAP.html"))
 
 #===OPEN WITH GOOGLE MAPS===
+upstream.limit_host("https://www.google.com", 2)
 def streetview_available(lat, lon):
     meta_url=("https://www.google.com/maps/@"
               f"?api=1&map_action=pano&viewpoint={lat},{lon}")
-    r = requests.get(meta_url, timeout=10).json()
+    r = upstream.get(meta_url, timeout=10).json()
     return r.get("status") == "OK"
 #https://www.google.com/maps/@?api=1&map_action=pano&viewpoint=LAT,LON
 """
@@ -728,6 +923,37 @@ def headers():
     print(headers)  # This will log all headers to your Flask console
     return jsonify(headers)"""
 
+#===WARM-UP===
+def load_models():
+    registry.load()
+    registry.start_watching()
+    import DynamicNASAFireRiskZones
+
+warmup.add('database', init_db)
+warmup.add('shapefile', get_boundary)
+warmup.add('map', create_fire_risk_map, after=('shapefile',))
+warmup.add('prediction_grid', get_grid, after=('shapefile',))
+warmup.add('dataset', get_dataset)
+warmup.add('spatial_index', get_spatial_index, after=('dataset',))
+warmup.add('h3_pyramid', get_pyramid)
+warmup.add('risk_stream', load_risk_stream, after=('dataset',))
+warmup.add('catalog', get_catalog, after=('spatial_index',))
+warmup.add('access_counter', lambda: access_counter.seed_from_log(access_log_file))
+warmup.add('models', load_models)
+
+# nginx health check: 200 once every component is loaded
+@app.route('/ready')
+def ready():
+    status = warmup.status()
+    return jsonify(status), 200 if status['ready'] else 503
+
+def create_app():
+    # Returns at once, the components above load on background threads
+    warmup.start()
+    return app
+
 if __name__ == '__main__':
-    serve(app, host='127.0.0.1', port=5000)
+    # Proxy routes may hold at most UPSTREAM_TOTAL_LIMIT of these threads and
+    # SSE streams MAX_STREAMS, see async_upstream.py
+    serve(create_app(), host='127.0.0.1', port=5000, threads=16)
 
@@ -0,0 +1,195 @@
+#Flat-array export of the RandomForestClassifier models
+#Every tree's nodes are concatenated into one set of contiguous arrays
+#(feature, threshold, left/right child, per-node class probabilities) saved
+#as .npy files in <model>.flat/<sha1 of the joblib file>/ and opened
+#memory-mapped, so loading is near-instant and worker processes share the
+#pages. An export directory is never modified once written. Leaves point to
+#themselves, which lets the predictor step all trees max_depth times with
+#plain numpy indexing. Exports are checked bit-identical against sklearn
+#(n_jobs=1) before they are written.
+#Export with:  python flat_forest.py
+
+import os
+import sys
+import json
+import shutil
+import numpy as np
+import joblib
+from build_cache import file_digest
+
+FLAT_SUFFIX = '.flat'
+FLAT_VERSION = 1
+ARRAYS = ('roots', 'feature', 'threshold', 'left', 'right', 'leaf_proba', 'classes')
+
+
+def flat_path(model_path: str, source_sha1: str) -> str:
+    return os.path.join(os.path.splitext(model_path)[0] + FLAT_SUFFIX, source_sha1)
+
+
+def _leaf_proba(value: np.ndarray, n_classes: int) -> np.ndarray:
+    # What DecisionTreeClassifier.predict_proba returns for a sample in each node
+    proba = np.array(value[:, 0, :n_classes], dtype=np.float64)
+    sums = proba.sum(axis=1)
+    if np.allclose(sums, 1.0):
+        return proba  # sklearn >= 1.4 stores fractions and returns them as is
+    sums[sums == 0.0] = 1.0
+    return proba / sums[:, np.newaxis]
+
+
+def flatten(model) -> dict:
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise ValueError("Only single-output forests can be flattened")
+    n_classes = len(model.classes_)
+    roots, feature, threshold, left, right, leaf_proba = [], [], [], [], [], []
+    offset = max_depth = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        ids = np.arange(tree.node_count, dtype=np.int32) + offset
+        is_leaf = tree.children_left < 0
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, tree.feature).astype(np.int32))
+        threshold.append(tree.threshold.astype(np.float64))
+        left.append(np.where(is_leaf, ids, tree.children_left + offset).astype(np.int32))
+        right.append(np.where(is_leaf, ids, tree.children_right + offset).astype(np.int32))
+        leaf_proba.append(_leaf_proba(tree.value, n_classes))
+        max_depth = max(max_depth, tree.max_depth)
+        offset += tree.node_count
+    return {
+        'roots': np.array(roots, dtype=np.int32),
+        'feature': np.concatenate(feature),
+        'threshold': np.concatenate(threshold),
+        'left': np.concatenate(left),
+        'right': np.concatenate(right),
+        'leaf_proba': np.ascontiguousarray(np.concatenate(leaf_proba)),
+        'classes': np.asarray(model.classes_),
+        'meta': {'n_features': int(model.n_features_in_), 'max_depth': int(max_depth)},
+    }
+
+
+class FlatForest:
+    def __init__(self, arrays: dict, meta: dict):
+        self.roots = arrays['roots']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.leaf_proba = arrays['leaf_proba']
+        self.classes_ = np.asarray(arrays['classes'])
+        self.n_features_in_ = meta['n_features']
+        self.max_depth = meta['max_depth']
+        self.meta = meta
+
+    @classmethod
+    def load(cls, directory: str):
+        with open(os.path.join(directory, 'meta.json'), 'r') as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in ARRAYS}
+        return cls(arrays, meta)
+
+    def apply(self, X) -> np.ndarray:
+        # -> (n_trees, n_samples) leaf node ids
+        X = np.asarray(X, dtype=np.float32)  # the dtype sklearn trees compare in
+        rows = np.arange(len(X))
+        node = np.repeat(np.asarray(self.roots)[:, np.newaxis], len(X), axis=1)
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[node]]
+            node = np.where(x <= self.threshold[node], self.left[node], self.right[node])
+        return node
+
+    def predict_proba(self, X) -> np.ndarray:
+        leaves = self.apply(X)
+        proba = np.zeros((leaves.shape[1], len(self.classes_)))
+        # Tree order and float64 accumulation as in RandomForestClassifier
+        for tree_leaves in leaves:
+            proba += self.leaf_proba[tree_leaves]
+        proba /= len(leaves)
+        return proba
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+
+def verify(model, flat: FlatForest, probe: np.ndarray):
+    # Raises ValueError unless flat reproduces sklearn exactly on probe
+    n_jobs = getattr(model, 'n_jobs', None)
+    model.n_jobs = 1  # sequential, fixed-order accumulation
+    try:
+        expected = model.predict_proba(probe)
+    finally:
+        model.n_jobs = n_jobs
+    if not np.array_equal(flat.predict_proba(probe), expected):
+        raise ValueError("Flat forest probabilities differ from sklearn")
+    if not np.array_equal(flat.predict(probe), model.classes_.take(np.argmax(expected, axis=1), axis=0)):
+        raise ValueError("Flat forest classes differ from sklearn")
+
+
+def remove_stale(model_path: str, keep: str):
+    # Exports of other model versions. A directory that cannot be renamed is
+    # still memory-mapped somewhere (Windows refuses), it is left for next time.
+    base = os.path.splitext(model_path)[0] + FLAT_SUFFIX
+    for name in os.listdir(base):
+        path = os.path.join(base, name)
+        if name == keep or name.endswith('.trash'):
+            continue
+        trash = f'{path}.trash'
+        try:
+            os.rename(path, trash)
+        except OSError:
+            continue
+        shutil.rmtree(trash, ignore_errors=True)
+
+
+def export(model_path: str, probe: np.ndarray, model=None) -> str:
+    source_sha1 = file_digest(model_path)
+    model = model if model is not None else joblib.load(model_path)
+    flat = flatten(model)
+    meta = dict(flat.pop('meta'), flat_version=FLAT_VERSION, source_sha1=source_sha1)
+    verify(model, FlatForest(flat, meta), probe)
+
+    directory = flat_path(model_path, source_sha1)
+    if load_if_current(model_path, source_sha1) is None:
+        # Written aside and renamed into place, readers only see complete exports
+        tmp_dir = f'{directory}.{os.getpid()}.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        for name in ARRAYS:
+            np.save(os.path.join(tmp_dir, f'{name}.npy'), flat[name])
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=1)
+        shutil.rmtree(directory, ignore_errors=True)  # incomplete leftover, never mapped
+        os.rename(tmp_dir, directory)
+    remove_stale(model_path, keep=source_sha1)
+    return directory
+
+
+def load_if_current(model_path: str, source_sha1: str):
+    # -> FlatForest exported from exactly this model file, else None
+    directory = flat_path(model_path, source_sha1)
+    try:
+        flat = FlatForest.load(directory)
+    except (OSError, ValueError, KeyError):
+        return None
+    if flat.meta.get('flat_version') != FLAT_VERSION or flat.meta.get('source_sha1') != source_sha1:
+        return None
+    return flat
+
+
+if __name__ == '__main__':
+    from model_registry import VEGETATION_MODEL, FIRE_MODEL
+    from prediction_grid import GRID_BBOX, build_grid
+
+    # Probe: the served grid plus random points over its bbox
+    grid = build_grid()
+    west, south, east, north = GRID_BBOX
+    rng = np.random.default_rng(42)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lat = np.concatenate([grid['Latitude'].to_numpy(), rng.uniform(south, north, n)])
+    lon = np.concatenate([grid['Longitude'].to_numpy(), rng.uniform(west, east, n)])
+
+    vegetation = joblib.load(VEGETATION_MODEL)
+    coords = np.c_[lat, lon]
+    print(f"{VEGETATION_MODEL} -> {export(VEGETATION_MODEL, coords, vegetation)}")
+    vegetation.n_jobs = 1
+    features = np.c_[lat, lon, vegetation.predict(coords)]
+    print(f"{FIRE_MODEL} -> {export(FIRE_MODEL, features)}")
+    print(f"Verified bit-identical on {len(lat)} points")
@@ -0,0 +1,136 @@
+#Precomputed H3 pyramid (resolutions 4-9) for the vegetation point layer
+#Build offline with:  python h3_pyramid.py
+#Points are aggregated once at the finest resolution, coarser levels are
+#rolled up from the finer cells by clearing the H3 index digits.
+
+import os
+import threading
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from utlis import resource_path
+from parquet_store import PARQUET_FILE, get_dataset
+from h3_aggregation import h3_cells, h3_to_strings
+
+PYRAMID_FILE = resource_path('csv_support/Final_sheet_h3_pyramid.parquet')
+MIN_RESOLUTION = 4
+MAX_RESOLUTION = 9
+
+# H3 index layout: 4 resolution bits at 52, then 3 bits per digit for res 1..15
+_H3_RES_SHIFT = 52
+_H3_RES_MASK = np.uint64(0xF << _H3_RES_SHIFT)
+
+
+def h3_parent(cells: np.ndarray, resolution: int) -> np.ndarray:
+    parents = (cells & ~_H3_RES_MASK) | np.uint64(resolution << _H3_RES_SHIFT)
+    unused = 0
+    for r in range(resolution + 1, 16):
+        unused |= 7 << ((15 - r) * 3)
+    return parents | np.uint64(unused)
+
+
+def build_pyramid(dataset=None) -> pd.DataFrame:
+    if dataset is None:
+        dataset = get_dataset()
+    lat = dataset.column('Latitude')
+    lon = dataset.column('Longitude')
+    codes = dataset.column('Vegetation_Density').astype(np.int64)
+    classes = np.asarray(dataset.categories('Vegetation_Density'), dtype=object)
+    k = len(classes)
+
+    cells = h3_cells(lat, lon, MAX_RESOLUTION)
+    uniq, inverse = np.unique(cells, return_inverse=True)
+    n = len(uniq)
+    counts = np.bincount(inverse, minlength=n)
+    sum_lat = np.bincount(inverse, weights=lat.astype(np.float64), minlength=n)
+    sum_lon = np.bincount(inverse, weights=lon.astype(np.float64), minlength=n)
+    votes = np.bincount(inverse * k + codes, minlength=n * k).reshape(n, k)
+
+    levels = []
+    for res in range(MAX_RESOLUTION, MIN_RESOLUTION - 1, -1):
+        if res < MAX_RESOLUTION:
+            parents, inverse = np.unique(h3_parent(uniq, res), return_inverse=True)
+            m = len(parents)
+            counts = np.bincount(inverse, weights=counts, minlength=m).astype(np.int64)
+            sum_lat = np.bincount(inverse, weights=sum_lat, minlength=m)
+            sum_lon = np.bincount(inverse, weights=sum_lon, minlength=m)
+            votes = np.stack([np.bincount(inverse, weights=votes[:, j], minlength=m) for j in range(k)],
+                             axis=1).astype(np.int64)
+            uniq = parents
+        levels.append(pd.DataFrame({
+            'resolution': np.full(len(uniq), res, dtype=np.int8),
+            'h3_index': h3_to_strings(uniq),
+            'Latitude': sum_lat / counts,
+            'Longitude': sum_lon / counts,
+            'Vegetation_Density': classes[votes.argmax(axis=1)],
+            'count': counts,
+        }))
+    return pd.concat(levels[::-1], ignore_index=True)
+
+
+def save_pyramid(pyramid: pd.DataFrame, path: str = PYRAMID_FILE):
+    table = pa.Table.from_pandas(pyramid, preserve_index=False)
+    tmp_path = path + '.tmp'
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def resolution_for(bbox, zoom=None) -> int:
+    if zoom is None:
+        # Leaflet zoom that shows this bbox on a ~1000px wide map
+        west, south, east, north = bbox
+        width = max(east - west, north - south, 1e-6)
+        zoom = np.log2(360.0 * 4 / width)
+    # Zoom 10, the usual view, gets res 7 (~5 km2), the fixed resolution used before
+    res = int(round(zoom)) - 3
+    return min(max(res, MIN_RESOLUTION), MAX_RESOLUTION)
+
+
+class H3Pyramid:
+    def __init__(self, path: str = PYRAMID_FILE):
+        df = pd.read_parquet(path)
+        self.levels = {}
+        for res, level in df.groupby('resolution'):
+            # Sorted by latitude so a bbox is a searchsorted range plus a lon mask
+            level = level.sort_values('Latitude').drop(columns='resolution').reset_index(drop=True)
+            self.levels[int(res)] = level
+
+    def query(self, bbox, resolution: int) -> pd.DataFrame:
+        west, south, east, north = bbox
+        level = self.levels[resolution]
+        lat = level['Latitude'].to_numpy()
+        start = np.searchsorted(lat, south, side='left')
+        stop = np.searchsorted(lat, north, side='right')
+        rows = level.iloc[start:stop]
+        lon = rows['Longitude'].to_numpy()
+        return rows[(lon >= west) & (lon <= east)]
+
+
+_pyramid = None
+_pyramid_checked = False
+_pyramid_lock = threading.Lock()
+
+def get_pyramid():
+    # None when the pyramid was not built or is older than the dataset
+    global _pyramid, _pyramid_checked
+    if not _pyramid_checked:
+        with _pyramid_lock:
+            if not _pyramid_checked:
+                if not os.path.exists(PYRAMID_FILE):
+                    logging.warning(f"H3 pyramid missing, run h3_pyramid.py to build {PYRAMID_FILE}")
+                elif os.path.getmtime(PYRAMID_FILE) < os.path.getmtime(PARQUET_FILE):
+                    logging.warning("H3 pyramid is older than Final_sheet.parquet, rebuild it with h3_pyramid.py")
+                else:
+                    _pyramid = H3Pyramid()
+                _pyramid_checked = True
+    return _pyramid
+
+
+if __name__ == '__main__':
+    pyramid = build_pyramid()
+    save_pyramid(pyramid)
+    for res, level in pyramid.groupby('resolution'):
+        print(f"res {res}: {len(level)} cells")
+    print(f"Pyramid saved to {PYRAMID_FILE}")
@@ -0,0 +1,48 @@
+#Chunked parallel inference for the vegetation -> fire-risk model chain
+#Features are packed once into contiguous float32 arrays (the dtype sklearn
+#trees convert to anyway, so results match the unchunked call) and the rows
+#are split into chunks predicted on a thread pool. Tree traversal releases
+#the GIL, so the chunks run in parallel.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+CHUNK_SIZE = int(os.getenv('INFERENCE_CHUNK_SIZE', 8192))
+INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', os.cpu_count() or 1))
+
+# Threads start on first use
+pool = ThreadPoolExecutor(INFERENCE_THREADS, thread_name_prefix='inference')
+
+
+def single_threaded(model):
+    # The pool parallelizes across chunks, nested joblib threads would oversubscribe
+    if getattr(model, 'n_jobs', None) not in (None, 1):
+        model.n_jobs = 1
+    return model
+
+
+def predict_chain(vegetation, fire, lat, lon, chunk_size=CHUNK_SIZE, executor=None):
+    # -> (vegetation class, fire risk class) per point
+    n = len(lat)
+    features = np.empty((n, 3), dtype=np.float32)
+    features[:, 0] = lat
+    features[:, 1] = lon
+    coords = np.ascontiguousarray(features[:, :2])
+    veg = np.empty(n, dtype=vegetation.classes_.dtype)
+    risk = np.empty(n, dtype=fire.classes_.dtype)
+
+    def run(start):
+        stop = min(start + chunk_size, n)
+        veg[start:stop] = vegetation.predict(coords[start:stop])
+        features[start:stop, 2] = veg[start:stop]
+        risk[start:stop] = fire.predict(features[start:stop])
+
+    starts = range(0, n, chunk_size)
+    if len(starts) <= 1:
+        for start in starts:
+            run(start)
+    else:
+        # list() re-raises the first chunk error
+        list((executor or pool).map(run, starts))
+    return veg, risk
@@ -1,12 +1,27 @@
 import os
+import sys
+import queue
+import atexit
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 log_dir = os.path.join(os.getenv('APPDATA'), 'FireHouseRomania')
 #log_dir=os.path.abspath("logs")
 os.makedirs(log_dir, exist_ok=True)
-log_path = os.path.join(log_dir, 'app.log')
+# One file per program (app-proiect_cpp.log, app-flask_app.log, ...): Windows
+# cannot roll over a log that another process still has open
+program = os.path.splitext(os.path.basename(sys.argv[0] or 'app'))[0] or 'app'
+log_path = os.path.join(log_dir, f'app-{program}.log')
+
+# Callers only enqueue records, the listener thread does the file I/O
+file_handler = RotatingFileHandler(log_path, maxBytes=10 * 2**20, backupCount=5)
+file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+log_queue = queue.SimpleQueue()
+listener = QueueListener(log_queue, file_handler)
+listener.start()
+atexit.register(listener.stop)
+
 logging.basicConfig(
-    filename=log_path,
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+    handlers=[QueueHandler(log_queue)]
 )
\ No newline at end of file
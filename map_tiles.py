@@ -0,0 +1,239 @@
+#Slippy-map tiles for the Final_sheet points
+#Points for a tile come from the grid index, are decimated to one point per
+#(class, grid cell) for the zoom level and encoded as a Mapbox Vector Tile.
+#Low zooms get raster heatmap tiles binned with numpy instead.
+#Rendered tiles are cached on disk under the dataset content hash.
+
+import os
+import math
+import zlib
+import struct
+import shutil
+import threading
+import logging
+import numpy as np
+from utlis import resource_path
+from parquet_store import get_dataset
+from spatial_index import get_spatial_index
+
+TILE_CACHE_DIR = resource_path('Maps/tiles')
+TILE_EXTENT = 4096
+MAX_ZOOM = 18
+LAYER_NAME = 'vegetation'
+HEATMAP_SIZE = 256
+HEATMAP_SATURATION = 50  # points per pixel at full opacity
+
+HEATMAP_COLORS = {
+    'vegetation': ('Vegetation_Density', {
+        'Low_Vegetation': (255, 255, 0),
+        'Medium_Vegetation': (255, 165, 0),
+        'High_Vegetation': (255, 0, 0),
+    }),
+    'risk': ('Fire_Risk', {
+        'Very Low': (0, 128, 0),
+        'Low': (255, 255, 0),
+        'Medium': (255, 165, 0),
+        'High': (255, 0, 0),
+        'Very High': (139, 0, 0),
+    }),
+}
+DEFAULT_COLOR = (128, 128, 128)
+
+
+#===TILE MATH===
+def valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def _tile_lat(y, z):
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / 2 ** z))))
+
+
+def tile_bounds(z: int, x: int, y: int):
+    n = 2 ** z
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    return west, _tile_lat(y + 1, z), east, _tile_lat(y, z)
+
+
+def _mercator_y(lat):
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+
+def project_to_tile(lat, lon, z, x, y, extent=TILE_EXTENT):
+    # -> pixel coordinates inside the tile, y pointing down
+    west, south, east, north = tile_bounds(z, x, y)
+    px = (np.asarray(lon, dtype=np.float64) - west) / (east - west) * extent
+    top, bottom = _mercator_y(north), _mercator_y(south)
+    py = (top - _mercator_y(np.asarray(lat, dtype=np.float64))) / (top - bottom) * extent
+    return px, py
+
+
+def tile_points(z, x, y, extent=TILE_EXTENT):
+    dataset = get_dataset()
+    rows = get_spatial_index().query(tile_bounds(z, x, y))
+    lat = dataset.column('Latitude')[rows]
+    lon = dataset.column('Longitude')[rows]
+    return rows, project_to_tile(lat, lon, z, x, y, extent)
+
+
+#===VECTOR TILES===
+def _varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _varints(values) -> bytes:
+    # Packed varint encoding of a whole array at once
+    v = np.asarray(values, dtype=np.uint64)
+    if v.size == 0:
+        return b''
+    shifts = np.arange(0, 70, 7, dtype=np.uint64)
+    groups = ((v[:, None] >> shifts) & np.uint64(0x7F)).astype(np.uint8)
+    n_bytes = 1 + ((v[:, None] >> shifts[1:]) > 0).sum(axis=1)
+    position = np.arange(len(shifts))[None, :]
+    groups[position < (n_bytes - 1)[:, None]] |= 0x80
+    return groups[position < n_bytes[:, None]].tobytes()
+
+
+def _field(number: int, payload: bytes) -> bytes:
+    return _varint((number << 3) | 2) + _varint(len(payload)) + payload
+
+
+def _uint_field(number: int, value: int) -> bytes:
+    return _varint(number << 3) + _varint(value)
+
+
+def _zigzag(values):
+    values = np.asarray(values, dtype=np.int64)
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def _multipoint_geometry(px, py) -> bytes:
+    # MoveTo(count) followed by zigzag deltas from the previous point
+    dx = np.diff(px, prepend=0)
+    dy = np.diff(py, prepend=0)
+    deltas = np.empty(2 * len(px), dtype=np.uint64)
+    deltas[0::2] = _zigzag(dx)
+    deltas[1::2] = _zigzag(dy)
+    return _varint(1 | (len(px) << 3)) + _varints(deltas)
+
+
+def decimation_grid(z: int) -> int:
+    # Cells per tile side, one kept point per class and cell
+    return TILE_EXTENT >> max(0, min(4, 10 - z))
+
+
+def vector_tile(z: int, x: int, y: int) -> bytes:
+    dataset = get_dataset()
+    rows, (px, py) = tile_points(z, x, y)
+    codes = dataset.column('Vegetation_Density')[rows].astype(np.int64)
+    classes = dataset.categories('Vegetation_Density')
+
+    grid = decimation_grid(z)
+    scale = TILE_EXTENT // grid
+    gx = np.clip(px // scale, 0, grid - 1).astype(np.int64)
+    gy = np.clip(py // scale, 0, grid - 1).astype(np.int64)
+    cells = np.unique((codes * grid + gy) * grid + gx)
+    cls, rest = np.divmod(cells, grid * grid)
+    gy, gx = np.divmod(rest, grid)
+    px = gx * scale + scale // 2
+    py = gy * scale + scale // 2
+
+    features = b''
+    for code in np.unique(cls):
+        sel = cls == code
+        feature = (_field(2, _varints([0, code]))
+                   + _uint_field(3, 1)
+                   + _field(4, _multipoint_geometry(px[sel], py[sel])))
+        features += _field(2, feature)
+
+    layer = (_field(1, LAYER_NAME.encode())
+             + features
+             + _field(3, b'Vegetation_Density')
+             + b''.join(_field(4, _field(1, c.encode())) for c in classes)
+             + _uint_field(5, TILE_EXTENT)
+             + _uint_field(15, 2))
+    return _field(3, layer)
+
+
+#===HEATMAP TILES===
+def encode_png(rgba: np.ndarray) -> bytes:
+    height, width, _ = rgba.shape
+    # Filter byte 0 (None) in front of every scanline
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + chunk(b'IEND', b''))
+
+
+def heatmap_tile(z: int, x: int, y: int, by: str = 'vegetation') -> bytes:
+    column, colors = HEATMAP_COLORS[by]
+    dataset = get_dataset()
+    classes = dataset.categories(column)
+    k = len(classes)
+
+    rows, (px, py) = tile_points(z, x, y, HEATMAP_SIZE)
+    codes = dataset.column(column)[rows].astype(np.int64)
+    keep = codes >= 0
+    gx = np.clip(px[keep], 0, HEATMAP_SIZE - 1).astype(np.int64)
+    gy = np.clip(py[keep], 0, HEATMAP_SIZE - 1).astype(np.int64)
+    pixel = gy * HEATMAP_SIZE + gx
+
+    # Per-pixel class histogram: density from the total, colour from the majority class
+    votes = np.bincount(pixel * k + codes[keep], minlength=HEATMAP_SIZE ** 2 * k).reshape(-1, k)
+    counts = votes.sum(axis=1)
+    palette = np.array([colors.get(c, DEFAULT_COLOR) for c in classes], dtype=np.uint8)
+
+    rgba = np.zeros((HEATMAP_SIZE ** 2, 4), dtype=np.uint8)
+    rgba[:, :3] = palette[votes.argmax(axis=1)]
+    alpha = np.log1p(counts) / np.log1p(HEATMAP_SATURATION)
+    rgba[:, 3] = np.where(counts > 0, 55 + 200 * np.clip(alpha, 0, 1), 0).astype(np.uint8)
+    return encode_png(rgba.reshape(HEATMAP_SIZE, HEATMAP_SIZE, 4))
+
+
+#===DISK CACHE===
+_pruned = None
+_prune_lock = threading.Lock()
+
+def tile_cache_dir() -> str:
+    # Tiles of the loaded dataset version; other versions are removed once
+    global _pruned
+    version = get_dataset().version[:16]
+    if _pruned != version:
+        with _prune_lock:
+            if _pruned != version:
+                if os.path.isdir(TILE_CACHE_DIR):
+                    for name in os.listdir(TILE_CACHE_DIR):
+                        if name != version:
+                            logging.info(f"Removing tiles of dataset version {name}")
+                            shutil.rmtree(os.path.join(TILE_CACHE_DIR, name), ignore_errors=True)
+                _pruned = version
+    return os.path.join(TILE_CACHE_DIR, version)
+
+
+def cached_tile(kind: str, z: int, x: int, y: int, ext: str, render) -> bytes:
+    path = os.path.join(tile_cache_dir(), kind, str(z), str(x), f'{y}.{ext}')
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    data = render(z, x, y)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return data
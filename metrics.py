@@ -0,0 +1,69 @@
+#In-process access counters behind /diagnostics
+#Accesses go into a ring of hourly buckets; rendering never rereads the log.
+
+import os
+import logging
+import itertools
+import threading
+from datetime import datetime
+import pandas as pd
+
+
+class HourlyCounter:
+    def __init__(self, hours: int = 24):
+        self.hours = hours
+        self._counts = [0] * hours
+        self._hour_ids = [None] * hours
+        self._lock = threading.Lock()
+        self.created = datetime.now()
+
+    @staticmethod
+    def _hour_id(when: datetime) -> int:
+        return int(when.timestamp() // 3600)
+
+    def add(self, when: datetime, n: int = 1):
+        hour_id = self._hour_id(when)
+        slot = hour_id % self.hours
+        with self._lock:
+            if self._hour_ids[slot] != hour_id:
+                # Bucket still holds an hour that fell out of the window
+                self._hour_ids[slot] = hour_id
+                self._counts[slot] = 0
+            self._counts[slot] += n
+
+    def last_hours(self, now: datetime = None) -> dict:
+        # -> {hour of day: count} over the rolling window
+        now = now or datetime.now()
+        newest = self._hour_id(now)
+        out = {}
+        with self._lock:
+            for hour_id, count in zip(self._hour_ids, self._counts):
+                if hour_id is not None and newest - self.hours < hour_id <= newest and count:
+                    hour = datetime.fromtimestamp(hour_id * 3600).hour
+                    out[hour] = out.get(hour, 0) + count
+        return dict(sorted(out.items()))
+
+    def seed_from_log(self, path: str):
+        # One-time read so a restart does not blank the chart; entries newer
+        # than the counter were already counted by add()
+        # Oldest hour still in the ring; one more would share a slot with the newest
+        oldest = datetime.fromtimestamp((self._hour_id(self.created) - self.hours + 1) * 3600)
+        # The current file and its rotated backups (path.1, path.2, ... newest
+        # first), until one was last written before the window
+        files = []
+        for candidate in [path] + [f'{path}.{i}' for i in itertools.count(1)]:
+            if not os.path.exists(candidate):
+                if candidate == path:
+                    continue
+                break
+            if datetime.fromtimestamp(os.path.getmtime(candidate)) < oldest:
+                break
+            files.append(candidate)
+        if not files:
+            return
+        df_log = pd.concat([pd.read_csv(f, header=None, names=['timestamp']) for f in files])
+        timestamps = pd.to_datetime(df_log['timestamp'], errors='coerce').dropna()
+        recent = timestamps[(timestamps >= oldest) & (timestamps < self.created)]
+        for hour_start, n in recent.dt.floor('h').value_counts().items():
+            self.add(hour_start.to_pydatetime(), int(n))
+        logging.info(f"Access counters seeded with {len(recent)} entries from {len(files)} file(s) of {path}")
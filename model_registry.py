@@ -0,0 +1,216 @@
+#Active vegetation + fire-risk models, hot-reloaded from models/
+#publish() writes both model files and then models/manifest.json with their
+#hashes. The watcher thread polls the manifest; when it changes, the pair is
+#loaded in the background, checked against the manifest and on a smoke batch,
+#and swapped in with a single reference assignment. Requests take one
+#ModelSet snapshot up front and finish on it, even if a swap happens meanwhile.
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+import numpy as np
+import joblib
+from utlis import resource_path
+from build_cache import file_digest, write_atomic
+from inference import predict_chain, single_threaded
+from flat_forest import load_if_current
+
+MODELS_DIR = resource_path('models')
+VEGETATION_MODEL = os.path.join(MODELS_DIR, 'vegetation_rf.joblib')
+FIRE_MODEL = os.path.join(MODELS_DIR, 'fire_rf_latest.joblib')
+MANIFEST = os.path.join(MODELS_DIR, 'manifest.json')
+POLL_SECONDS = float(os.getenv('MODEL_POLL_SECONDS', 30))
+HISTORY = 10
+
+# Fixed smoke batch over the prediction grid bbox
+_smoke_lat, _smoke_lon = (a.ravel() for a in np.meshgrid(np.linspace(43.7, 48.2, 16),
+                                                           np.linspace(20.3, 29.6, 16), indexing='ij'))
+
+
+def load_model(path: str, sha1: str):
+    # Memory-mapped flat export when it matches the file, see flat_forest.py
+    flat = load_if_current(path, sha1)
+    if flat is not None:
+        return flat
+    logging.info(f"No current flat export for {path}, unpickling it (run flat_forest.py to export)")
+    return single_threaded(joblib.load(path))
+
+
+def read_manifest(path: str = MANIFEST) -> dict:
+    # -> {model file name: sha1}, empty when there is no manifest
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)['files']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def publish(vegetation, fire, vegetation_path=VEGETATION_MODEL, fire_path=FIRE_MODEL, manifest=MANIFEST):
+    # Both files first, the manifest last: the watcher only reacts to the
+    # manifest, so it never pairs a new model with the previous one
+    os.makedirs(os.path.dirname(manifest), exist_ok=True)
+    files = {}
+    for model, path in ((vegetation, vegetation_path), (fire, fire_path)):
+        write_atomic(path, lambda tmp: joblib.dump(model, tmp))
+        files[os.path.basename(path)] = file_digest(path)
+
+    def write(tmp_path):
+        with open(tmp_path, 'w') as f:
+            json.dump({'published_at': datetime.now().isoformat(timespec='seconds'), 'files': files}, f, indent=1)
+    write_atomic(manifest, write)
+
+
+def file_signature(paths) -> tuple:
+    stats = [(path, os.stat(path)) for path in paths]
+    return tuple((path, st.st_size, st.st_mtime_ns) for path, st in stats)
+
+
+class ModelSet:
+    def __init__(self, vegetation_path=VEGETATION_MODEL, fire_path=FIRE_MODEL):
+        self.paths = (vegetation_path, fire_path)
+        self.signature = file_signature(self.paths)
+        digests = [file_digest(p) for p in self.paths]
+        self.digests = dict(zip(map(os.path.basename, self.paths), digests))
+        # Content hash of both files, keys cached predictions and responses
+        self.version = hashlib.sha1(''.join(digests).encode()).hexdigest()[:16]
+        self.vegetation = load_model(vegetation_path, digests[0])
+        self.fire = load_model(fire_path, digests[1])
+        self.loaded_at = datetime.now()
+
+    def predict(self, lat, lon):
+        # -> (vegetation class, fire risk class) per point
+        return predict_chain(self.vegetation, self.fire, lat, lon)
+
+    def describe(self) -> dict:
+        return {
+            'version': self.version,
+            'loaded_at': self.loaded_at.isoformat(timespec='seconds'),
+            'format': {'vegetation': type(self.vegetation).__name__, 'fire': type(self.fire).__name__},
+            'files': {
+                os.path.basename(path): {
+                    'size': size,
+                    'modified': datetime.fromtimestamp(mtime_ns / 1e9).isoformat(timespec='seconds'),
+                } for path, size, mtime_ns in self.signature
+            },
+        }
+
+
+def validate(candidate: ModelSet, active: ModelSet = None):
+    # Raises ValueError when candidate should not replace active
+    for name, model, n_features in (('vegetation', candidate.vegetation, 2), ('fire', candidate.fire, 3)):
+        if getattr(model, 'n_features_in_', n_features) != n_features:
+            raise ValueError(f"{name} model expects {model.n_features_in_} features, not {n_features}")
+    veg, risk = candidate.predict(_smoke_lat, _smoke_lon)
+    if len(veg) != len(_smoke_lat) or len(risk) != len(_smoke_lat):
+        raise ValueError("Smoke batch returned the wrong number of predictions")
+    if active is not None:
+        for name, new, old in (('vegetation', candidate.vegetation, active.vegetation),
+                               ('fire', candidate.fire, active.fire)):
+            if set(new.classes_) != set(old.classes_):
+                raise ValueError(f"{name} classes changed: {list(old.classes_)} -> {list(new.classes_)}")
+
+
+class ModelRegistry:
+    def __init__(self, paths=(VEGETATION_MODEL, FIRE_MODEL), manifest=MANIFEST, poll_seconds=POLL_SECONDS):
+        self.paths = paths
+        self.manifest = manifest
+        self.poll_seconds = poll_seconds
+        self._active = None
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._rejected = None
+        self._loaded = None
+        self.last_error = None
+        self.history = []
+
+    def current(self) -> ModelSet:
+        models = self._active
+        if models is None:
+            models = self.load()
+        return models
+
+    def load(self) -> ModelSet:
+        with self._lock:
+            if self._active is None:
+                self._loaded = file_signature(self._watched())
+                models = ModelSet(*self.paths)
+                published = read_manifest(self.manifest)
+                if published and published != models.digests:
+                    logging.warning("Model files do not match models/manifest.json, a publish may be in progress")
+                validate(models)
+                self._activate(models)
+            return self._active
+
+    def _activate(self, models):
+        previous = self._active
+        self._active = models
+        if previous is not None:
+            self.history.insert(0, previous.describe())
+            del self.history[HISTORY:]
+        logging.info(f"Model version {models.version} active")
+
+    def _watched(self) -> list:
+        # The manifest when publish() is used, the model files themselves otherwise
+        return [self.manifest] if os.path.exists(self.manifest) else list(self.paths)
+
+    def _reload(self, signature):
+        start = time.perf_counter()
+        try:
+            published = read_manifest(self.manifest)
+            candidate = ModelSet(*self.paths)
+            if published and published != candidate.digests:
+                return  # files no longer match the manifest, a newer publish is under way
+            if file_signature(self._watched()) != signature:
+                return  # replaced again while loading, the next poll picks it up
+            validate(candidate, self._active)
+        except Exception as e:
+            self._rejected = signature
+            self.last_error = f"{datetime.now().isoformat(timespec='seconds')}: {e}"
+            logging.error(f"Model reload rejected: {e}")
+            return
+        with self._lock:
+            self._activate(candidate)
+            self._loaded = signature
+        self.last_error = None
+        logging.info(f"Model reload took {time.perf_counter() - start:.1f}s")
+
+    def _watch(self):
+        pending = None
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                signature = file_signature(self._watched())
+            except OSError:
+                continue  # mid-replace
+            active = self._active
+            if active is None or signature == self._loaded or signature == self._rejected:
+                pending = None
+            elif signature != pending:
+                # Still being written? Load once it holds still for a poll
+                pending = signature
+            else:
+                self._reload(signature)
+                pending = None
+
+    def start_watching(self):
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name='model-watcher', daemon=True)
+                self._watcher.start()
+
+    def status(self) -> dict:
+        active = self._active
+        return {
+            'active': active.describe() if active else None,
+            'watching': self._watcher is not None,
+            'poll_seconds': self.poll_seconds,
+            'last_error': self.last_error,
+            'previous': self.history,
+        }
+
+
+registry = ModelRegistry()
@@ -0,0 +1,147 @@
+#Process-wide columnar store for Final_sheet.parquet
+#The file is read once, numeric columns are kept as float32 and the
+#string columns as categorical codes. Every endpoint reads the same arrays.
+
+import os
+import threading
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.dataset as ds
+from utlis import resource_path
+from build_cache import file_digest
+
+PARQUET_FILE = resource_path('csv_support/Final_sheet.parquet')
+
+NUMERIC_COLUMNS = ['Latitude', 'Longitude']
+CATEGORICAL_COLUMNS = ['Vegetation_Density', 'Fire_Risk']
+
+
+def _numeric_column(table: pa.Table, name: str) -> np.ndarray:
+    col = table.column(name)
+    if pa.types.is_floating(col.type) or pa.types.is_integer(col.type):
+        values = col.to_numpy()
+    else:
+        # Coordinates stored as text in some exports
+        values = pd.to_numeric(col.to_pandas(), errors='coerce').to_numpy()
+    return values.astype(np.float32, copy=False)
+
+
+def _categorical_column(table: pa.Table, name: str):
+    cat = pd.Categorical(table.column(name).to_pandas())
+    codes = np.asarray(cat.codes)
+    return codes, list(cat.categories)
+
+
+def _stat_key(path: str):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+class ParquetDataset:
+    def __init__(self, path: str = PARQUET_FILE):
+        self.path = path
+        # Hash and read the same file: retry if it was replaced in between
+        while True:
+            before = _stat_key(path)
+            version = file_digest(path)
+            table = pq.read_table(path, columns=NUMERIC_COLUMNS + CATEGORICAL_COLUMNS,
+                                  read_dictionary=CATEGORICAL_COLUMNS)
+            if _stat_key(path) == before:
+                break
+            logging.info(f"{path} changed while loading, reading it again")
+        # Content hash of the loaded file, keys every derived cache
+        self.version = version
+
+        columns = {name: _numeric_column(table, name) for name in NUMERIC_COLUMNS}
+        self._categories = {}
+        for name in CATEGORICAL_COLUMNS:
+            columns[name], self._categories[name] = _categorical_column(table, name)
+        del table
+
+        # Same rows load_parquet_data() used to keep
+        valid = (np.isfinite(columns['Latitude']) & np.isfinite(columns['Longitude'])
+                 & (columns['Vegetation_Density'] >= 0))
+        self._columns = {}
+        for name, values in columns.items():
+            values = np.ascontiguousarray(values[valid])
+            values.flags.writeable = False
+            self._columns[name] = values
+
+    def __len__(self):
+        return len(self._columns['Latitude'])
+
+    def column(self, name: str) -> np.ndarray:
+        # Read-only: float32 for coordinates, category codes for the rest
+        return self._columns[name]
+
+    def categories(self, name: str) -> list:
+        return list(self._categories[name])
+
+    def value_counts(self, name: str) -> dict:
+        codes = self._columns[name]
+        counts = np.bincount(codes[codes >= 0], minlength=len(self._categories[name]))
+        return {cat: int(n) for cat, n in zip(self._categories[name], counts) if n}
+
+    def frame(self, columns=None, rows=None) -> pd.DataFrame:
+        columns = columns or NUMERIC_COLUMNS + CATEGORICAL_COLUMNS
+        data = {}
+        for name in columns:
+            values = self._columns[name] if rows is None else self._columns[name][rows]
+            if name in self._categories:
+                values = pd.Categorical.from_codes(values, self._categories[name])
+            data[name] = values
+        # copy=False keeps the read-only buffers, writes into them raise
+        return pd.DataFrame(data, copy=False)
+
+    def memory_usage(self) -> dict:
+        per_column = {name: int(values.nbytes) for name, values in self._columns.items()}
+        return {
+            'rows': len(self),
+            'columns': per_column,
+            'total_bytes': sum(per_column.values()),
+        }
+
+
+def _is_numeric(field: pa.Field) -> bool:
+    return pa.types.is_floating(field.type) or pa.types.is_integer(field.type)
+
+
+def read_bbox(bbox, columns=None, path: str = PARQUET_FILE) -> pd.DataFrame:
+    # Predicate pushdown, on a repacked file (repack_parquet.py) only the
+    # row groups whose lat/lon statistics overlap the bbox are read
+    west, south, east, north = bbox
+    dataset = ds.dataset(path, format='parquet')
+    schema = dataset.schema
+    if all(_is_numeric(schema.field(name)) for name in NUMERIC_COLUMNS):
+        lat, lon = ds.field('Latitude'), ds.field('Longitude')
+        predicate = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return dataset.to_table(columns=columns, filter=predicate).to_pandas()
+
+    # Coordinates stored as text cannot be compared in arrow, read and filter here
+    read = None if columns is None else list(dict.fromkeys(list(columns) + NUMERIC_COLUMNS))
+    table = dataset.to_table(columns=read)
+    lat = _numeric_column(table, 'Latitude')
+    lon = _numeric_column(table, 'Longitude')
+    mask = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+    df = table.filter(pa.array(mask)).to_pandas()
+    df['Latitude'], df['Longitude'] = lat[mask], lon[mask]
+    return df if columns is None else df[list(columns)]
+
+
+_dataset = None
+_dataset_lock = threading.Lock()
+
+def get_dataset() -> ParquetDataset:
+    global _dataset
+    if _dataset is None:
+        with _dataset_lock:
+            if _dataset is None:
+                dataset = ParquetDataset()
+                usage = dataset.memory_usage()
+                logging.info(f"Loaded {usage['rows']} rows from {dataset.path} "
+                             f"({usage['total_bytes'] / 2**20:.1f} MiB)")
+                _dataset = dataset
+    return _dataset
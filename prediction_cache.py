@@ -0,0 +1,65 @@
+#Predicted classes for the prediction grid, computed once per model + grid
+#Keyed by the content hash of the model files and the grid version, so a new
+#fire_rf_latest.joblib (or a rebuilt grid) gets fresh predictions and
+#everything else is a lookup. Labels are also stored as a small parquet file
+#per key, which lets a restart with unchanged models skip inference.
+
+import os
+import logging
+import pandas as pd
+import geopandas as gpd
+from utlis import resource_path
+from build_cache import write_atomic
+from single_flight import SingleFlightLRU
+
+PREDICTIONS_DIR = resource_path('csv_support/predictions')
+LABEL_COLUMNS = ['Predicted_Vegetation', 'Predicted_Fire_Risk']
+MAX_ENTRIES = 4
+KEEP_FILES = 8
+
+
+class PredictionCache:
+    def __init__(self, directory=PREDICTIONS_DIR, max_entries=MAX_ENTRIES):
+        self.directory = directory
+        self._entries = SingleFlightLRU(max_entries)
+        self.misses = 0  # inference runs, loads from disk are not counted
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, f'{key}.parquet')
+
+    def _load(self, key, grid):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        labels = pd.read_parquet(path)
+        if not labels.index.equals(grid.gdf.index):
+            return None
+        return gpd.GeoDataFrame(grid.gdf.join(labels), geometry='geometry', crs=grid.gdf.crs)
+
+    def _save(self, key, preds):
+        os.makedirs(self.directory, exist_ok=True)
+        labels = preds[LABEL_COLUMNS].astype('int8')
+        write_atomic(self._path(key), labels.to_parquet)
+        files = sorted((os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                        if name.endswith('.parquet')), key=os.path.getmtime)
+        for path in files[:-KEEP_FILES]:
+            os.remove(path)
+
+    def _compute(self, key, grid, predict):
+        preds = self._load(key, grid)
+        if preds is None:
+            self.misses += 1
+            logging.info(f"Predicting {len(grid)} grid cells for {key}")
+            preds = predict(grid.gdf)
+            self._save(key, preds)
+        return preds
+
+    def get(self, grid, model_version: str, predict) -> gpd.GeoDataFrame:
+        # predict(grid_gdf) -> grid_gdf with LABEL_COLUMNS added, run on a miss.
+        # Shared frame, callers must not modify it
+        key = f'{model_version}_{grid.version}'
+        # Concurrent misses for one key wait for a single inference run
+        return self._entries.get(key, lambda: self._compute(key, grid, predict))
+
+    def stats(self) -> dict:
+        return {'entries': self._entries.keys(), 'hits': self._entries.hits, 'misses': self.misses}
@@ -0,0 +1,78 @@
+#Romania-clipped prediction grid shared by the AI endpoints
+#Built once per step with vectorized point construction and clipping,
+#persisted as GeoParquet (rebuilt only when the shapefile or the grid
+#definition changes) and kept in memory afterwards.
+#Prebuild with:  python prediction_grid.py [step]
+
+import os
+import sys
+import logging
+import threading
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from utlis import resource_path
+from build_cache import build_if_changed, stat_version
+from boundary import shapefile_files, get_boundary
+
+GRID_DIR = resource_path('csv_support/prediction_grid')
+GRID_BBOX = (20.2, 43.6, 29.7, 48.3)  # west, south, east, north
+DEFAULT_STEP = 0.05
+# Bump when build_grid output changes
+GRID_VERSION = 1
+
+
+def build_grid(step: float = DEFAULT_STEP, boundary=None) -> gpd.GeoDataFrame:
+    if boundary is None:
+        boundary = get_boundary()
+    west, south, east, north = GRID_BBOX
+    lats = np.arange(south, north, step)
+    lons = np.arange(west, east, step)
+    # Row-major over (lat, lon); the index keeps each cell's position in the full grid
+    lat, lon = (a.ravel() for a in np.meshgrid(lats, lons, indexing='ij'))
+    inside = np.flatnonzero(boundary.intersects_xy(lon, lat))
+    lat, lon = lat[inside], lon[inside]
+    return gpd.GeoDataFrame(
+        pd.DataFrame({'Latitude': lat, 'Longitude': lon}, index=inside),
+        geometry=gpd.points_from_xy(lon, lat),
+        crs='EPSG:4326'
+    )
+
+
+def grid_path(step: float) -> str:
+    return os.path.join(GRID_DIR, f'grid_{step:g}.parquet')
+
+
+class PredictionGrid:
+    def __init__(self, step: float = DEFAULT_STEP):
+        self.step = step
+        self.path = grid_path(step)
+        os.makedirs(GRID_DIR, exist_ok=True)
+        build_if_changed(self.path, shapefile_files(), lambda tmp: build_grid(step).to_parquet(tmp),
+                         GRID_VERSION, extra={'step': step, 'bbox': GRID_BBOX})
+        self.gdf = gpd.read_parquet(self.path)
+        # Changes only when the file is rebuilt, keys the prediction cache
+        self.version = stat_version([self.path])
+
+    def __len__(self):
+        return len(self.gdf)
+
+
+_grids = {}
+_grids_lock = threading.Lock()
+
+def get_grid(step: float = DEFAULT_STEP) -> PredictionGrid:
+    grid = _grids.get(step)
+    if grid is None:
+        with _grids_lock:
+            grid = _grids.get(step)
+            if grid is None:
+                grid = PredictionGrid(step)
+                logging.info(f"Prediction grid step={step:g}: {len(grid)} cells from {grid.path}")
+                _grids[step] = grid
+    return grid
+
+
+if __name__ == '__main__':
+    grid = get_grid(float(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_STEP)
+    print(f"{len(grid)} cells -> {grid.path}")
@@ -0,0 +1,79 @@
+#Repack Final_sheet.parquet in Hilbert-curve order
+#usage: python repack_parquet.py [source.parquet] [destination.parquet]
+#Rows close on the map end up in the same row groups, and every row group
+#carries min/max Latitude/Longitude statistics, so bbox filters pushed down
+#through pyarrow.dataset skip every row group outside the box.
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from parquet_store import PARQUET_FILE
+
+HILBERT_ORDER = 16
+ROW_GROUP_SIZE = 64_000
+
+
+def hilbert_key(lat: np.ndarray, lon: np.ndarray, order: int = HILBERT_ORDER) -> np.ndarray:
+    n = 1 << order
+    valid = np.isfinite(lat) & np.isfinite(lon)
+    south, north = np.nanmin(lat), np.nanmax(lat)
+    west, east = np.nanmin(lon), np.nanmax(lon)
+
+    x = np.zeros(len(lat), dtype=np.uint64)
+    y = np.zeros(len(lat), dtype=np.uint64)
+    x[valid] = np.clip((lon[valid] - west) / max(east - west, 1e-12) * (n - 1), 0, n - 1).astype(np.uint64)
+    y[valid] = np.clip((lat[valid] - south) / max(north - south, 1e-12) * (n - 1), 0, n - 1).astype(np.uint64)
+
+    # Classic xy -> d walk, vectorized over all points
+    d = np.zeros(len(lat), dtype=np.uint64)
+    last = np.uint64(n - 1)
+    s = n >> 1
+    while s > 0:
+        s_ = np.uint64(s)
+        rx = (x & s_) > 0
+        ry = (y & s_) > 0
+        d += s_ * s_ * ((3 * rx.astype(np.uint64)) ^ ry.astype(np.uint64))
+        flip = ~ry & rx
+        x = np.where(flip, last - x, x)
+        y = np.where(flip, last - y, y)
+        x, y = np.where(~ry, y, x), np.where(~ry, x, y)
+        s >>= 1
+
+    # Rows without coordinates go last
+    d[~valid] = np.iinfo(np.uint64).max
+    return d
+
+
+def _float_column(table: pa.Table, name: str) -> pa.ChunkedArray:
+    col = table.column(name)
+    if pa.types.is_floating(col.type) or pa.types.is_integer(col.type):
+        return col.cast(pa.float64())
+    # Text coordinates would give lexicographic row-group statistics
+    values = pd.to_numeric(col.to_pandas(), errors='coerce')
+    return pa.chunked_array([pa.array(values, type=pa.float64())])
+
+
+def repack(source: str = PARQUET_FILE, destination: str = PARQUET_FILE, row_group_size: int = ROW_GROUP_SIZE):
+    table = pq.read_table(source)
+    for name in ('Latitude', 'Longitude'):
+        table = table.set_column(table.schema.get_field_index(name), name, _float_column(table, name))
+
+    lat = table.column('Latitude').to_numpy()
+    lon = table.column('Longitude').to_numpy()
+    order = np.argsort(hilbert_key(lat, lon), kind='stable')
+    table = table.take(pa.array(order))
+
+    tmp_path = destination + '.tmp'
+    pq.write_table(table, tmp_path, row_group_size=row_group_size, write_statistics=True)
+    os.replace(tmp_path, destination)
+    return pq.ParquetFile(destination).metadata
+
+
+if __name__ == '__main__':
+    source = sys.argv[1] if len(sys.argv) > 1 else PARQUET_FILE
+    destination = sys.argv[2] if len(sys.argv) > 2 else source
+    metadata = repack(source, destination)
+    print(f"{metadata.num_rows} rows in {metadata.num_row_groups} row groups written to {destination}")
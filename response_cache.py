@@ -0,0 +1,66 @@
+#Precompressed JSON bodies with validators for the large GeoJSON routes
+#A body is serialized and compressed (gzip, brotli when installed) once per
+#route + data version + arguments. The ETag is derived from that same key plus
+#the negotiated encoding (each encoding is a different byte sequence), so a
+#matching If-None-Match is answered with 304 before anything is built.
+
+import gzip
+import json
+import hashlib
+from flask import request, Response
+from single_flight import SingleFlightLRU
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MAX_BODIES = 32
+
+
+class CompressedBody:
+    def __init__(self, raw: bytes):
+        self.identity = raw
+        self.gzip = gzip.compress(raw, compresslevel=6)
+        self.br = brotli.compress(raw, quality=9) if brotli is not None else None
+
+    def encoded(self, encoding):
+        return {'br': self.br, 'gzip': self.gzip}.get(encoding, self.identity)
+
+
+def negotiate(accept_encodings):
+    # -> Content-Encoding to send, None for identity
+    if brotli is not None and accept_encodings['br'] > 0:
+        return 'br'
+    if accept_encodings['gzip'] > 0:
+        return 'gzip'
+    return None
+
+
+class ResponseCache:
+    def __init__(self, max_items=MAX_BODIES):
+        self._bodies = SingleFlightLRU(max_items)
+
+    @staticmethod
+    def etag(key) -> str:
+        return hashlib.sha1(repr(key).encode()).hexdigest()[:20]
+
+    def _body(self, key, build) -> CompressedBody:
+        # Concurrent misses for one key wait for a single build
+        return self._bodies.get(key, lambda: CompressedBody(json.dumps(build(), separators=(',', ':')).encode()))
+
+    def json_response(self, route: str, version, build, args=()) -> Response:
+        # build() -> JSON-serializable payload, only called on a miss
+        key = (route, version, tuple(args))
+        encoding = negotiate(request.accept_encodings)
+        etag = f'{self.etag(key)}-{encoding or "identity"}'
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = Response(self._body(key, build).encoded(encoding), mimetype='application/json')
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
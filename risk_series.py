@@ -0,0 +1,68 @@
+#Compact backing store for the simulated fire-risk stream
+#One uint8 per row indexes a small table of risk levels; timestamps are
+#start + i seconds, so nothing else of the dataset is kept around.
+#usage: python risk_series.py  -> memory report, old frame vs compact store
+
+from datetime import datetime, timedelta
+import numpy as np
+
+# Convert categorical fire risk to numeric
+RISK_LEVELS = {
+    "Very Low": 0.2,
+    "Low": 0.4,
+    "Medium": 0.6,
+    "High": 0.8,
+    "Very High": 1.0
+}
+
+
+class RiskSeries:
+    def __init__(self, codes: np.ndarray, levels: np.ndarray, start: datetime, step_seconds: int = 1):
+        self.codes = codes
+        self.levels = levels
+        self.start = start
+        self.step = timedelta(seconds=step_seconds)
+
+    @classmethod
+    def from_dataset(cls, dataset, risk_map=RISK_LEVELS, start=None):
+        categories = dataset.categories('Fire_Risk')
+        if len(categories) >= 255:
+            raise ValueError(f"Too many Fire_Risk classes for uint8 codes: {len(categories)}")
+        # Missing (-1) and unmapped classes both read as 0.0, like fillna(0.0)
+        levels = np.array([risk_map.get(c, 0.0) for c in categories] + [0.0], dtype=np.float64)
+        codes = dataset.column('Fire_Risk').astype(np.int16)
+        codes[codes < 0] = len(categories)
+        return cls(codes.astype(np.uint8), levels, start or datetime.now())
+
+    def __len__(self):
+        return len(self.codes)
+
+    def rows(self, cursor: int, limit: int) -> list:
+        # Rows [cursor, cursor + limit), wrapping around at the end
+        idx = (cursor + np.arange(limit)) % len(self)
+        values = self.levels[self.codes[idx]]
+        return [{'timestamp': (self.start + self.step * int(i)).isoformat(), 'risk_level': float(v)}
+                for i, v in zip(idx, values)]
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.codes.nbytes + self.levels.nbytes)
+
+
+if __name__ == '__main__':
+    import pandas as pd
+    from parquet_store import PARQUET_FILE, get_dataset
+
+    dataset = get_dataset()
+    series = RiskSeries.from_dataset(dataset)
+
+    # Rebuild the old stream frame once to measure it
+    old = pd.read_parquet(PARQUET_FILE)
+    old['risk_level'] = old['Fire_Risk'].map(RISK_LEVELS).fillna(0.0)
+    old['timestamp'] = pd.date_range(start=datetime.now(), periods=len(old), freq='s')
+    before = int(old.memory_usage(deep=True).sum())
+    after = series.nbytes
+
+    print(f"rows:   {len(series)}")
+    print(f"before: {before / 2**20:10.1f} MiB  (full DataFrame + risk_level + timestamp)")
+    print(f"after:  {after / 2**20:10.1f} MiB  (uint8 codes + level table)")
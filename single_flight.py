@@ -0,0 +1,96 @@
+#Bounded LRU whose misses are single-flight
+#Concurrent get() calls for a missing key share one build(): the first caller
+#runs it, the others wait for its result (or its exception). Used by the
+#response, prediction and weather caches.
+
+import time
+import threading
+from collections import OrderedDict
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlightLRU:
+    def __init__(self, max_items: int, ttl: float = None, wait_timeout: float = None):
+        self.max_items = max_items
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self._entries = OrderedDict()  # key -> (expires or None, value)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _lookup(self, key):
+        # Caller holds the lock -> (found, value)
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires, value = entry
+        if expires is not None and expires <= time.time():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key, value):
+        expires = time.time() + self.ttl if self.ttl is not None else None
+        self._entries[key] = (expires, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+
+    def get(self, key, build, cacheable=None):
+        # build() -> value, run on a miss; cacheable(value) -> False keeps it out
+        # of the cache (it is still returned to every waiting caller).
+        # Raises TimeoutError when a waiting caller gives up after wait_timeout.
+        with self._lock:
+            found, value = self._lookup(key)
+            if found:
+                self.hits += 1
+                return value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not flight.done.wait(self.wait_timeout):
+                raise TimeoutError(f"Timed out waiting for {key!r}")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = build()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and (cacheable is None or cacheable(flight.result)):
+                    self._store(key, flight.result)
+                del self._inflight[key]
+            flight.done.set()
+        return flight.result
+
+    def keys(self) -> list:
+        with self._lock:
+            return list(self._entries)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._inflight)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
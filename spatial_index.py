@@ -0,0 +1,81 @@
+#Uniform grid index over the Final_sheet points
+#Row ids are sorted by grid cell (row-major), so the cells of one grid row
+#that overlap a bbox form a single contiguous slice of the sorted ids.
+
+import threading
+import logging
+import numpy as np
+from parquet_store import get_dataset
+
+CELL_DEG = 0.05
+
+
+class GridIndex:
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, cell_deg: float = CELL_DEG):
+        self.cell_deg = cell_deg
+        self.lat = lat
+        self.lon = lon
+        if len(lat) == 0:
+            self.south = self.west = 0.0
+            self.n_rows = self.n_cols = 0
+            self.order = np.empty(0, dtype=np.int64)
+            self.offsets = np.zeros(1, dtype=np.int64)
+            return
+
+        self.south = float(lat.min())
+        self.west = float(lon.min())
+        self.n_rows = int((float(lat.max()) - self.south) // cell_deg) + 1
+        self.n_cols = int((float(lon.max()) - self.west) // cell_deg) + 1
+
+        r = np.clip(((lat - self.south) / cell_deg).astype(np.int64), 0, self.n_rows - 1)
+        c = np.clip(((lon - self.west) / cell_deg).astype(np.int64), 0, self.n_cols - 1)
+        cell_id = r * self.n_cols + c
+
+        id_dtype = np.int32 if len(lat) < 2**31 else np.int64
+        self.order = np.argsort(cell_id, kind='stable').astype(id_dtype)
+        counts = np.bincount(cell_id, minlength=self.n_rows * self.n_cols)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def _cell_range(self, low, high, origin, n):
+        first = int(np.floor((low - origin) / self.cell_deg))
+        last = int(np.floor((high - origin) / self.cell_deg))
+        return max(first, 0), min(last, n - 1)
+
+    def query(self, bbox) -> np.ndarray:
+        west, south, east, north = bbox
+        if self.n_rows == 0 or west > east or south > north:
+            return np.empty(0, dtype=np.int64)
+
+        r0, r1 = self._cell_range(south, north, self.south, self.n_rows)
+        c0, c1 = self._cell_range(west, east, self.west, self.n_cols)
+        if r0 > r1 or c0 > c1:
+            return np.empty(0, dtype=np.int64)
+
+        slices = [self.order[self.offsets[r * self.n_cols + c0]:self.offsets[r * self.n_cols + c1 + 1]]
+                  for r in range(r0, r1 + 1)]
+        candidates = np.concatenate(slices)
+
+        # Border cells overhang the bbox, trim them exactly
+        lat = self.lat[candidates]
+        lon = self.lon[candidates]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return np.sort(candidates[inside]).astype(np.int64, copy=False)
+
+    def memory_usage(self) -> int:
+        return int(self.order.nbytes + self.offsets.nbytes)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_spatial_index() -> GridIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                dataset = get_dataset()
+                index = GridIndex(dataset.column('Latitude'), dataset.column('Longitude'))
+                logging.info(f"Spatial index built: {index.n_rows}x{index.n_cols} cells, "
+                             f"{index.memory_usage() / 2**20:.1f} MiB")
+                _index = index
+    return _index
@@ -0,0 +1,91 @@
+#SingleFlightLRU: eviction, TTL and one build per key under concurrency
+
+import os
+import sys
+import time
+import threading
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import single_flight
+from single_flight import SingleFlightLRU
+
+
+def test_hit_skips_build():
+    cache = SingleFlightLRU(4)
+    calls = []
+    for _ in range(3):
+        assert cache.get('a', lambda: calls.append(1) or 'A') == 'A'
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_evicts_least_recent():
+    cache = SingleFlightLRU(2)
+    for key in ('a', 'b', 'a', 'c'):
+        cache.get(key, lambda: key.upper())
+    assert cache.keys() == ['a', 'c']
+
+
+def test_expired_entries_are_rebuilt(monkeypatch):
+    cache = SingleFlightLRU(4, ttl=10)
+    cache.get('a', lambda: 1)
+    later = time.time() + 11
+    monkeypatch.setattr(single_flight.time, 'time', lambda: later)
+    assert cache.get('a', lambda: 2) == 2
+
+
+def test_uncacheable_results_are_not_stored():
+    cache = SingleFlightLRU(4)
+    cache.get('a', lambda: 502, cacheable=lambda status: status == 200)
+    assert len(cache) == 0
+
+
+def test_concurrent_misses_share_one_build():
+    cache = SingleFlightLRU(4)
+    release = threading.Event()
+    calls = []
+
+    def build():
+        calls.append(1)
+        release.wait(5)
+        return 'value'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get('k', build))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while cache.misses + cache.coalesced < 5:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+    assert results == ['value'] * 5
+    assert len(calls) == 1
+    assert cache.in_flight() == 0
+
+
+def test_build_error_is_raised_and_not_cached():
+    cache = SingleFlightLRU(4)
+    with pytest.raises(ValueError):
+        cache.get('k', lambda: (_ for _ in ()).throw(ValueError('boom')))
+    assert len(cache) == 0
+    assert cache.get('k', lambda: 'ok') == 'ok'
+
+
+def test_waiter_times_out():
+    cache = SingleFlightLRU(4, wait_timeout=0.05)
+    started, release = threading.Event(), threading.Event()
+
+    def build():
+        started.set()
+        release.wait(5)
+        return 'slow'
+
+    leader = threading.Thread(target=cache.get, args=('k', build))
+    leader.start()
+    started.wait(5)
+    with pytest.raises(TimeoutError):
+        cache.get('k', build)
+    release.set()
+    leader.join()
@@ -0,0 +1,119 @@
+#WeatherTileCache against a local stand-in for tile.openweathermap.org
+
+import os
+import sys
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import pytest
+
+pytest.importorskip('aiohttp')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import weather_proxy
+from weather_proxy import WeatherTileCache, LAYER_TTL
+
+
+@pytest.fixture
+def tile_server():
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            if self.path.startswith('/broken/'):
+                body, status, content_type = b'upstream failed', 502, 'text/plain'
+            else:
+                body, status, content_type = b'PNG' + self.path.split('?')[0].encode(), 200, 'image/png'
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_address[1]}', hits
+    server.shutdown()
+
+
+@pytest.fixture
+def make_cache(tile_server, tmp_path):
+    url, _ = tile_server
+
+    def make(**kwargs):
+        return WeatherTileCache('test-key', base_url=url, cache_dir=str(tmp_path), **kwargs)
+    return make
+
+
+def test_memory_hit_skips_upstream(make_cache, tile_server):
+    _, hits = tile_server
+    cache = make_cache()
+    first, _ = cache.get('clouds_new', 5, 17, 11)
+    second, _ = cache.get('clouds_new', 5, 17, 11)
+    assert first.content == b'PNG/clouds_new/5/17/11.png'
+    assert second is first
+    assert len(hits) == 1
+
+
+def test_lru_evicts_least_recent(make_cache):
+    cache = make_cache(max_items=2)
+    for y in (1, 2, 1, 3):
+        cache.get('clouds_new', 5, 17, y)
+    assert list(cache._memory) == [('clouds_new', 5, 17, 1), ('clouds_new', 5, 17, 3)]
+
+
+def test_disk_hit_survives_restart(make_cache, tile_server):
+    _, hits = tile_server
+    make_cache().get('temp_new', 4, 8, 5)
+    entry, _ = make_cache().get('temp_new', 4, 8, 5)
+    assert entry.content == b'PNG/temp_new/4/8/5.png'
+    assert len(hits) == 1
+
+
+def test_expired_tiles_are_refetched(make_cache, tile_server, monkeypatch):
+    _, hits = tile_server
+    cache = make_cache()
+    cache.get('precipitation_new', 3, 4, 2)
+    later = time.time() + LAYER_TTL['precipitation_new'] + 1
+    monkeypatch.setattr(weather_proxy.time, 'time', lambda: later)
+    cache.get('precipitation_new', 3, 4, 2)
+    assert len(hits) == 2
+
+
+def test_etag_answers_not_modified(make_cache):
+    cache = make_cache()
+    entry, _ = cache.get('wind_new', 6, 36, 22)
+    again, _ = make_cache().get('wind_new', 6, 36, 22)
+    assert entry.etag == again.etag
+    assert entry.not_modified(entry.etag)
+    assert entry.not_modified(f'"other", {entry.etag}')
+    assert not entry.not_modified('"other"')
+    assert not entry.not_modified(None)
+
+
+def test_upstream_error_is_passed_through_and_not_cached(make_cache, tile_server, tmp_path):
+    _, hits = tile_server
+    cache = make_cache()
+    entry, response = cache.get('broken', 2, 1, 1)
+    assert entry is None
+    assert response.status_code == 502
+    cache.get('broken', 2, 1, 1)
+    assert len(hits) == 2
+    assert not (tmp_path / 'broken').exists()
+
+
+def test_prune_removes_expired_then_oldest(make_cache, tmp_path):
+    cache = make_cache()
+    for y in range(3):
+        cache.get('clouds_new', 5, 17, y)
+    old = tmp_path / 'clouds_new' / '5' / '17' / '0.png'
+    stale = time.time() - LAYER_TTL['clouds_new'] - 1
+    os.utime(old, (stale, stale))
+    assert cache.prune_disk() == 1
+    assert not old.exists()
+
+    cache.max_disk_bytes = 0
+    assert cache.prune_disk() == 2
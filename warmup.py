@@ -0,0 +1,105 @@
+#Background warm-up of the heavy server components
+#Each component loads on its own thread once its dependencies are ready;
+#routes declare what they need and answer 503 until it is loaded, or 500
+#with the error if it failed to load.
+
+import time
+import logging
+import threading
+from datetime import datetime
+from functools import wraps
+from flask import jsonify
+
+
+class Warmup:
+    def __init__(self):
+        self._components = {}
+        self._lock = threading.Lock()
+        self._started = False
+
+    def add(self, name, load, after=()):
+        self._components[name] = {
+            'load': load,
+            'after': tuple(after),
+            'state': 'pending',
+            'started_at': None,
+            'seconds': None,
+            'error': None,
+            'done': threading.Event(),
+        }
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for name in self._components:
+            threading.Thread(target=self._run, args=(name,), name=f'warmup-{name}', daemon=True).start()
+
+    def _run(self, name):
+        component = self._components[name]
+        for dep in component['after']:
+            self._components[dep]['done'].wait()
+            if self._components[dep]['state'] != 'ready':
+                component['state'] = 'failed'
+                component['error'] = f'{dep} failed to load'
+                component['done'].set()
+                return
+
+        component['state'] = 'running'
+        component['started_at'] = datetime.now().isoformat(timespec='seconds')
+        start = time.perf_counter()
+        try:
+            component['load']()
+        except Exception as e:
+            logging.exception(f"Warm-up of {name} failed")
+            component['state'] = 'failed'
+            component['error'] = str(e)
+        else:
+            component['state'] = 'ready'
+        finally:
+            component['seconds'] = round(time.perf_counter() - start, 3)
+            logging.info(f"Warm-up {name}: {component['state']} in {component['seconds']}s")
+            component['done'].set()
+
+    def is_ready(self, *names) -> bool:
+        names = names or tuple(self._components)
+        return all(self._components[n]['state'] == 'ready' for n in names)
+
+    def wait(self, *names, timeout=None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for name in names or tuple(self._components):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            self._components[name]['done'].wait(remaining)
+        return self.is_ready(*names)
+
+    def failed(self, *names) -> dict:
+        # -> {name: error} of the components that will not become ready
+        names = names or tuple(self._components)
+        return {n: self._components[n]['error'] for n in names if self._components[n]['state'] == 'failed'}
+
+    def status(self) -> dict:
+        return {
+            'ready': self.is_ready(),
+            'failed': self.failed(),
+            'components': {
+                name: {key: c[key] for key in ('state', 'started_at', 'seconds', 'error')}
+                for name, c in self._components.items()
+            },
+        }
+
+    def requires(self, *names):
+        # Route decorator: 503 + Retry-After until the components are loaded,
+        # 500 without a retry hint once one of them has failed
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                failed = self.failed(*names)
+                if failed:
+                    return jsonify({'error': 'Server component failed to load', 'failed': failed}), 500
+                pending = [n for n in names if self._components[n]['state'] != 'ready']
+                if pending:
+                    return jsonify({'error': 'Server warming up', 'pending': pending}), 503, {'Retry-After': '5'}
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
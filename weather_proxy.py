@@ -0,0 +1,239 @@
+#Caching layer for the OpenWeatherMap proxy routes
+#Tiles: bounded in-memory LRU in front of an on-disk tier, keyed by
+#layer/z/x/y, each entry living as long as its layer's refresh interval.
+#Current weather: responses keyed by lat/lon snapped to a grid, with
+#concurrent misses for one cell coalesced into a single upstream call.
+#Upstream calls go through the shared asyncio client (async_upstream.py).
+
+import os
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from utlis import resource_path
+from build_cache import write_atomic
+from async_upstream import upstream, UpstreamTimeout
+from single_flight import SingleFlightLRU
+
+# Overridable so the proxy can be pointed at a local stand-in server
+WEATHER_TILE_URL = os.getenv('OPENWEATHER_TILE_URL', 'https://tile.openweathermap.org/map')
+WEATHER_API_URL = os.getenv('OPENWEATHER_API_URL', 'https://api.openweathermap.org/data/2.5/weather')
+WEATHER_TILE_DIR = resource_path('Maps/weather_tiles')
+UPSTREAM_TIMEOUT = 10
+# A cold map view asks for a screenful of tiles at once (browsers open about 6
+# connections per host), so tiles get more slots than the default 4; all hosts
+# together stay within UPSTREAM_TOTAL_LIMIT (async_upstream.py).
+TILE_HOST_LIMIT = int(os.getenv('UPSTREAM_TILE_HOST_LIMIT', 8))
+upstream.limit_host(WEATHER_TILE_URL, TILE_HOST_LIMIT)
+
+# Seconds between upstream refreshes of each layer
+LAYER_TTL = {
+    'clouds_new': 600,
+    'precipitation_new': 600,
+    'temp_new': 1800,
+    'wind_new': 1800,
+    'pressure_new': 3600,
+}
+DEFAULT_TTL = 600
+MEMORY_TILES = 2048
+MAX_DISK_BYTES = 256 * 2**20
+DISK_PRUNE_INTERVAL = 600
+
+# County centroids are far apart, 0.05 deg (~5 km) cells still share hits
+WEATHER_GRID_DEG = float(os.getenv('WEATHER_GRID_DEG', 0.05))
+WEATHER_TTL = 600
+MAX_WEATHER_ENTRIES = 10000
+
+_LAYER_RE = re.compile(r'^[a-z0-9_]+$')
+
+
+def valid_layer(layer: str) -> bool:
+    return bool(_LAYER_RE.match(layer))
+
+
+def tile_etag(content: bytes) -> str:
+    return '"' + hashlib.sha1(content).hexdigest()[:20] + '"'
+
+
+class TileEntry:
+    def __init__(self, content, content_type, expires):
+        self.content = content
+        self.content_type = content_type
+        self.expires = expires
+        self.etag = tile_etag(content)
+
+    def max_age(self) -> int:
+        return max(0, int(self.expires - time.time()))
+
+    def not_modified(self, if_none_match: str) -> bool:
+        return self.etag in (if_none_match or '')
+
+
+class WeatherTileCache:
+    def __init__(self, api_key, base_url=WEATHER_TILE_URL, cache_dir=WEATHER_TILE_DIR, max_items=MEMORY_TILES,
+                 max_disk_bytes=MAX_DISK_BYTES):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.cache_dir = cache_dir
+        self.max_items = max_items
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def _disk_path(self, layer, z, x, y):
+        return os.path.join(self.cache_dir, layer, str(z), str(x), f'{y}.png')
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def _from_memory(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= time.time():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry
+
+    def _from_disk(self, layer, key):
+        path = self._disk_path(*key)
+        try:
+            expires = os.path.getmtime(path) + LAYER_TTL.get(layer, DEFAULT_TTL)
+            if expires <= time.time():
+                return None
+            with open(path, 'rb') as f:
+                return TileEntry(f.read(), 'image/png', expires)
+        except OSError:
+            return None
+
+    def _fetch(self, layer, z, x, y):
+        # -> (entry or None, upstream response)
+        url = f"{self.base_url}/{layer}/{z}/{x}/{y}.png"
+        response = upstream.get(url, params={'appid': self.api_key}, timeout=UPSTREAM_TIMEOUT)
+        if response.status_code != 200:
+            return None, response
+        entry = TileEntry(response.content, response.headers.get('Content-Type', 'image/png'),
+                          time.time() + LAYER_TTL.get(layer, DEFAULT_TTL))
+
+        path = self._disk_path(layer, z, x, y)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        def write(tmp_path):
+            with open(tmp_path, 'wb') as f:
+                f.write(entry.content)
+        write_atomic(path, write)
+        self._maybe_prune()
+        return entry, response
+
+    def prune_disk(self, now: float = None) -> int:
+        # Drops expired tiles, then the oldest ones while over max_disk_bytes
+        now = now or time.time()
+        kept = []
+        removed = 0
+        for root, _, names in os.walk(self.cache_dir):
+            layer = os.path.relpath(root, self.cache_dir).split(os.sep)[0]
+            ttl = LAYER_TTL.get(layer, DEFAULT_TTL)
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                    if st.st_mtime + ttl <= now:
+                        os.remove(path)
+                        removed += 1
+                    else:
+                        kept.append((st.st_mtime, st.st_size, path))
+                except OSError:
+                    continue
+        total = sum(size for _, size, _ in kept)
+        for _, size, path in sorted(kept):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            total -= size
+        return removed
+
+    def _maybe_prune(self):
+        # At most once per DISK_PRUNE_INTERVAL, off the request thread
+        now = time.time()
+        if now - self._last_prune < DISK_PRUNE_INTERVAL or not self._prune_lock.acquire(blocking=False):
+            return
+        self._last_prune = now
+
+        def run():
+            try:
+                self.prune_disk()
+            finally:
+                self._prune_lock.release()
+        threading.Thread(target=run, name='weather-tile-prune', daemon=True).start()
+
+    def get(self, layer, z, x, y):
+        # -> (entry, None) on success, (None, upstream response) on upstream errors
+        key = (layer, z, x, y)
+        entry = self._from_memory(key)
+        if entry is None:
+            entry = self._from_disk(layer, key)
+            if entry is None:
+                entry, response = self._fetch(layer, z, x, y)
+                if entry is None:
+                    return None, response
+            self._remember(key, entry)
+        return entry, None
+
+
+class WeatherDataCache:
+    def __init__(self, api_key, base_url=WEATHER_API_URL, grid_deg=WEATHER_GRID_DEG, ttl=WEATHER_TTL):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.grid_deg = grid_deg
+        self.ttl = ttl
+        self._entries = SingleFlightLRU(MAX_WEATHER_ENTRIES, ttl=ttl, wait_timeout=UPSTREAM_TIMEOUT + 5)
+
+    def cell(self, lat: float, lon: float):
+        return round(lat / self.grid_deg), round(lon / self.grid_deg)
+
+    def _fetch(self, cell):
+        # Upstream is asked for the cell centre, so every hit is the same answer
+        params = {
+            'lat': round(cell[0] * self.grid_deg, 6),
+            'lon': round(cell[1] * self.grid_deg, 6),
+            'appid': self.api_key,
+            'units': 'metric',
+        }
+        response = upstream.get(self.base_url, params=params, timeout=UPSTREAM_TIMEOUT)
+        return response.json(), response.status_code
+
+    def get(self, lat: float, lon: float):
+        # -> (payload, status code); concurrent misses for one cell share a fetch
+        cell = self.cell(lat, lon)
+        try:
+            return self._entries.get(cell, lambda: self._fetch(cell), cacheable=lambda result: result[1] == 200)
+        except TimeoutError:
+            raise UpstreamTimeout(f"Weather lookup for cell {cell} timed out")
+
+    def stats(self) -> dict:
+        entries = self._entries
+        hits, misses, coalesced = entries.hits, entries.misses, entries.coalesced
+        lookups = hits + misses + coalesced
+        return {
+            'hits': hits,
+            'misses': misses,
+            'coalesced': coalesced,
+            'hit_ratio': (hits + coalesced) / lookups if lookups else 0.0,
+            'entries': len(entries),
+            'in_flight': entries.in_flight(),
+            'grid_deg': self.grid_deg,
+            'ttl_seconds': self.ttl,
+        }